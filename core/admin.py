@@ -1,6 +1,9 @@
 
 from django.contrib import admin
-from .models import Student, Teacher, Course, Enrollment, Attendance, Grade
+from .models import (
+    Student, Teacher, Course, Enrollment, Attendance, AttendanceBitmap, Grade, StudentSummary,
+    CourseDailyAttendance, StudentMonthlyAttendance, CourseMonthlyAttendance
+)
 
 admin.site.register(Student)
 admin.site.register(Teacher)
@@ -8,3 +11,8 @@ admin.site.register(Course)
 admin.site.register(Enrollment)
 admin.site.register(Attendance)
 admin.site.register(Grade)
+admin.site.register(StudentSummary)
+admin.site.register(AttendanceBitmap)
+admin.site.register(CourseDailyAttendance)
+admin.site.register(StudentMonthlyAttendance)
+admin.site.register(CourseMonthlyAttendance)
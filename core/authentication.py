@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .roles import make_role, role_of
+
+
+def set_role_claims(token, user):
+    """Write the user's current role, teacher_id, student_id, is_staff and username claims"""
+    role = role_of(user)
+    token['role'] = role.name
+    token['teacher_id'] = role.teacher_id
+    token['student_id'] = role.student_id
+    token['is_staff'] = user.is_staff
+    token['username'] = user.get_username()
+    return token
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Issues tokens carrying the user's role claims. Access tokens made from
+    the refresh token inherit them; RoleTokenRefreshSerializer rewrites
+    them from the database on every refresh.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        return set_role_claims(super().get_token(user), user)
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh that reloads the user instead of copying the old claims:
+    deleted and inactive users are refused, and the new access token (and
+    the rotated refresh token) carry the user's current role. A role change
+    therefore reaches the API within one access token lifetime.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        set_role_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # The blacklist app isn't installed
+                    pass
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class ClaimsUser(TokenUser):
+    """Request user built from a token's claims; never touches the database"""
+
+    def __init__(self, token):
+        super().__init__(token)
+        self._user_role = make_role(
+            token.get('is_staff', False), token.get('teacher_id'), token.get('student_id')
+        )
+
+    @cached_property
+    def id(self):
+        # The claim may be a string; compare equal to the users' real primary keys
+        return get_user_model()._meta.pk.to_python(super().id)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the role claims in the token instead of
+    loading the user, so permissions and role scoping run without identity
+    queries. Tokens issued before the claims existed fall back to the
+    database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if 'role' not in validated_token:
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
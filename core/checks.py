@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends whose entries only the current process can see
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """The data versions behind cached responses and roles must reach every worker"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', PER_PROCESS_CACHES[0])
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [Warning(
+        'The default cache is local to each process.',
+        hint=(
+            'Data versions (core.utils.response_cache) invalidate cached '
+            'responses and the roles RoleMiddleware keeps in the session; '
+            'with a per-process cache other workers never see a bump. '
+            'Configure a shared backend in CACHES.'
+        ),
+        id='core.W001',
+    )]
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from core.utils.attendance import pack_attendance
+
+class Command(BaseCommand):
+    help = 'Pack daily attendance rows into compact per-student, per-course, per-term bitmaps'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of attendance rows to read per database round-trip (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Packing attendance records into bitmaps...')
+        
+        started = time.monotonic()
+        row_count, bitmap_count = pack_attendance(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully packed {row_count} attendance records into {bitmap_count} bitmaps '
+                f'in {elapsed:.2f}s!'
+            )
+        )
@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from core.utils.attendance import rebuild_attendance_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and monthly attendance rollup tables from attendance records'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding attendance rollups...')
+        
+        started = time.monotonic()
+        written = rebuild_attendance_rollups()
+        elapsed = time.monotonic() - started
+        
+        for model_name, count in written.items():
+            self.stdout.write(f'• {model_name}: {count} rows')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt attendance rollups in {elapsed:.2f}s!')
+        )
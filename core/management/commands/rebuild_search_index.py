@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from core.utils.search import rebuild_search_index, search_enabled
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of students, teachers and courses'
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            self.stdout.write(self.style.WARNING('Full-text search needs SQLite; nothing to rebuild.'))
+            return
+
+        self.stdout.write('Rebuilding the search index...')
+        
+        counts = rebuild_search_index()
+        
+        summary = ', '.join(f'{count} {kind}s' for kind, count in counts.items())
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully indexed {summary}!')
+        )
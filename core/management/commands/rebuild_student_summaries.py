@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.utils.grading import rebuild_student_summaries
+
+class Command(BaseCommand):
+    help = 'Rebuild the persisted academic summary (GPA, courses, marks, best grade) for every student'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding student academic summaries...')
+        
+        rebuilt_count = rebuild_student_summaries()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {rebuilt_count} student summaries!')
+        )
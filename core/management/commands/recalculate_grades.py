@@ -1,60 +1,136 @@
-from django.core.management.base import BaseCommand
-from core.models import Grade
-from core.utils.grading import calculate_nepali_grade
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from core.models import Course, Grade, Student
+from core.utils.grading import calculate_nepali_grades, get_grade_distribution, rebuild_student_summaries
+from core.utils.rankings import invalidate_rankings
+from core.utils.response_cache import bump_data_version
 
 class Command(BaseCommand):
     help = 'Recalculate all grades using Nepali grading system'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of grades to read, grade and write per transaction (default: 2000)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would change without writing anything'
+        )
+        parser.add_argument(
+            '--course', metavar='CODE',
+            help='Only recalculate grades for the course with this code'
+        )
+        parser.add_argument(
+            '--class', dest='student_class', metavar='CLASS',
+            help='Only recalculate grades for students in this class (e.g. 10A)'
+        )
+
     def handle(self, *args, **options):
-        self.stdout.write('Recalculating all grades using Nepali grading system...')
-        
+        self.verbosity = options['verbosity']
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be a positive number.')
+
         grades = Grade.objects.all()
-        updated_count = 0
-        
-        for grade in grades:
-            old_grade = grade.grade
-            old_points = getattr(grade, 'grade_point', 0.0)
-            
-            # Recalculate using Nepali system
-            new_grade, new_points = calculate_nepali_grade(grade.marks)
-            
-            grade.grade = new_grade
-            grade.grade_point = new_points
-            grade.save()
-            
-            if old_grade != new_grade:
-                self.stdout.write(
-                    f'✓ {grade.student.name} - {grade.course.name}: '
-                    f'{grade.marks}% → {old_grade} → {new_grade} (GPA: {new_points})'
-                )
-            else:
-                self.stdout.write(
-                    f'• {grade.student.name} - {grade.course.name}: '
-                    f'{grade.marks}% → {new_grade} (GPA: {new_points}) [unchanged]'
-                )
-            
-            updated_count += 1
-        
+        if options['course']:
+            if not Course.objects.filter(code=options['course']).exists():
+                raise CommandError(f'Course "{options["course"]}" does not exist.')
+            grades = grades.filter(course__code=options['course'])
+        if options['student_class']:
+            grades = grades.filter(student__student_class=options['student_class'])
+
+        self.stdout.write(
+            'Recalculating grades using Nepali grading system'
+            f'{" (dry run)" if dry_run else ""}...'
+        )
+
+        started = time.monotonic()
+        processed_count = 0
+        changed_count = 0
+        changed_classes = set()
+        changed_course_ids = set()
+
+        rows = grades.only('id', 'student_id', 'course_id', 'marks', 'grade', 'grade_point').annotate(
+            student_class=F('student__student_class'),
+        ).order_by('id')
+        chunk = []
+        for grade in rows.iterator(chunk_size=chunk_size):
+            chunk.append(grade)
+            if len(chunk) >= chunk_size:
+                changed_count += self.process_chunk(chunk, changed_classes, changed_course_ids, dry_run)
+                processed_count += len(chunk)
+                self.report_progress(processed_count, changed_count, started)
+                chunk = []
+        if chunk:
+            changed_count += self.process_chunk(chunk, changed_classes, changed_course_ids, dry_run)
+            processed_count += len(chunk)
+            self.report_progress(processed_count, changed_count, started)
+
+        # Drop the cached rankings and API responses the changed grades feed
+        if changed_count and not dry_run:
+            invalidate_rankings(changed_classes, changed_course_ids)
+            bump_data_version('grade')
+
+        elapsed = time.monotonic() - started
+        rate = processed_count / elapsed if elapsed > 0 else processed_count
+        verb = 'would change' if dry_run else 'changed'
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully recalculated {updated_count} grades using Nepali grading system!'
+                f'Successfully recalculated {processed_count} grades using Nepali grading system! '
+                f'{changed_count} {verb}, {processed_count - changed_count} unchanged '
+                f'in {elapsed:.2f}s ({rate:.0f} grades/s).'
             )
         )
-        
+
         # Show grade distribution
         self.stdout.write('\n=== GRADE DISTRIBUTION ===')
-        grade_counts = {}
-        for grade in Grade.objects.all():
-            grade_counts[grade.grade] = grade_counts.get(grade.grade, 0) + 1
-        
-        for grade_letter in ['A+', 'A', 'B+', 'B', 'C+', 'C', 'D+', 'D', 'E']:
-            count = grade_counts.get(grade_letter, 0)
+        grade_counts = get_grade_distribution(grades)
+
+        for grade_letter, count in grade_counts.items():
             if count > 0:
                 self.stdout.write(f'{grade_letter}: {count} students')
-        
+
         # Show some student GPAs
         self.stdout.write('\n=== SAMPLE STUDENT GPAs ===')
-        from core.models import Student
-        students = Student.objects.all()[:5]
+        students = Student.objects.select_related('summary')[:5]
         for student in students:
-            self.stdout.write(f'{student.name}: GPA {student.gpa}')
\ No newline at end of file
+            self.stdout.write(f'{student.name}: GPA {student.gpa}')
+
+    def process_chunk(self, chunk, changed_classes, changed_course_ids, dry_run):
+        """
+        Grade a chunk in one batch and write back only the rows that changed,
+        refreshing their students' summaries in the same transaction
+        """
+        new_grades, new_points = calculate_nepali_grades([grade.marks for grade in chunk])
+
+        changed = []
+        for grade, new_grade, points in zip(chunk, new_grades, new_points):
+            if grade.grade == new_grade and grade.grade_point == points:
+                continue
+            if self.verbosity >= 2:
+                self.stdout.write(
+                    f'✓ Grade #{grade.id}: {grade.marks}% → {grade.grade} → {new_grade} (GPA: {points})'
+                )
+            grade.grade = new_grade
+            grade.grade_point = points
+            changed.append(grade)
+            changed_classes.add(grade.student_class)
+            changed_course_ids.add(grade.course_id)
+
+        if changed and not dry_run:
+            with transaction.atomic():
+                Grade.objects.bulk_update(changed, ['grade', 'grade_point'])
+                # bulk_update skips the Grade signals
+                rebuild_student_summaries({grade.student_id for grade in changed})
+        return len(changed)
+
+    def report_progress(self, processed_count, changed_count, started):
+        elapsed = time.monotonic() - started
+        rate = processed_count / elapsed if elapsed > 0 else processed_count
+        self.stdout.write(
+            f'• {processed_count} grades processed, {changed_count} changed ({rate:.0f} grades/s)'
+        )
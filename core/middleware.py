@@ -0,0 +1,129 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
+from django.utils.functional import SimpleLazyObject
+from .query_budget import QueryBudgetExceeded, QueryCounter, get_query_budget
+from .roles import NO_ROLE, UserRole, make_role
+from .utils.response_cache import get_data_versions
+
+logger = logging.getLogger(__name__)
+
+ROLE_SESSION_KEY = '_user_role'
+
+# Creating or removing a profile bumps these, which re-resolves cached roles
+PROFILE_MODELS = ('teacher', 'student')
+
+
+def _load_profile(request, role):
+    from .models import Student, Teacher
+
+    if role.teacher_id is not None:
+        profile = Teacher.objects.get(pk=role.teacher_id)
+    elif role.student_id is not None:
+        profile = Student.objects.get(pk=role.student_id)
+    else:
+        return None
+    profile.user = request.user
+    return profile
+
+
+def resolve_role(request):
+    """
+    (UserRole, profile) for the request's user. The first request of a
+    session loads the user with both profiles in one select_related query
+    and stores the ids in the session. Later requests rebuild the role from
+    the session and load the profile only if a view uses it. Sessions are
+    tied to the teacher and student data versions, which live in the shared
+    cache, so a profile created or removed by any worker re-resolves them.
+    """
+    from django.contrib.auth.models import User
+
+    user = request.user
+    if not user.is_authenticated:
+        return UserRole(NO_ROLE), None
+
+    versions = get_data_versions(PROFILE_MODELS)
+    cached = request.session.get(ROLE_SESSION_KEY)
+    if cached and cached['user_id'] == user.pk and cached['versions'] == versions:
+        role = make_role(user.is_staff, cached['teacher_id'], cached['student_id'])
+        profile = SimpleLazyObject(lambda: _load_profile(request, role))
+    else:
+        loaded = User.objects.select_related('teacher', 'student').get(pk=user.pk)
+        teacher = getattr(loaded, 'teacher', None)
+        student = getattr(loaded, 'student', None)
+        role = make_role(
+            user.is_staff,
+            teacher.id if teacher is not None else None,
+            student.id if student is not None else None,
+        )
+        profile = teacher if teacher is not None else student
+        if profile is not None:
+            profile.user = user
+        request.session[ROLE_SESSION_KEY] = {
+            'user_id': user.pk,
+            'teacher_id': role.teacher_id,
+            'student_id': role.student_id,
+            'versions': versions,
+        }
+
+    # Lets core.roles.role_of() and the DRF permissions reuse it for free
+    user._user_role = role
+    return role, profile
+
+
+class RoleMiddleware:
+    """
+    Sets request.role (a core.roles.UserRole) and request.profile (the
+    user's Teacher or Student, or None). Both are resolved lazily, once per
+    request, on first use. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        resolved = []
+
+        def resolve():
+            if not resolved:
+                resolved.extend(resolve_role(request))
+            return resolved
+
+        request.role = SimpleLazyObject(lambda: resolve()[0])
+        request.profile = SimpleLazyObject(lambda: resolve()[1])
+        return self.get_response(request)
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts every request's queries and checks them against the view's
+    budget (see core.query_budget) while settings.QUERY_BUDGET_CHECK is on.
+    Overruns are logged, or raised as QueryBudgetExceeded when
+    QUERY_BUDGET_ACTION is 'raise'. Must come first, so the session and
+    authentication queries count too. Streamed response bodies are read
+    after the middleware returns and are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_BUDGET_CHECK', False):
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        budget = get_query_budget(match.func, request) if match is not None else None
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{request.method} {request.path} ({match.view_name}) ran '
+                f'{counter.count} queries, over its budget of {budget}'
+            )
+            if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
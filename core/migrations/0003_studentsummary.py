@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def build_summaries(apps, schema_editor):
+    from core.utils.grading import _summary_values
+
+    Grade = apps.get_model('core', 'Grade')
+    Student = apps.get_model('core', 'Student')
+    StudentSummary = apps.get_model('core', 'StudentSummary')
+
+    totals = {
+        row.pop('student_id'): row
+        for row in Grade.objects.values('student_id').annotate(
+            count=Count('id'),
+            total_marks=Sum('marks'),
+            total_points=Sum('grade_point'),
+            best_point=Max('grade_point'),
+        ).order_by()
+    }
+    empty = {'count': 0, 'total_marks': 0.0, 'total_points': 0.0, 'best_point': None}
+    StudentSummary.objects.bulk_create(
+        [
+            StudentSummary(student_id=student_id, **_summary_values(**totals.get(student_id, empty)))
+            for student_id in Student.objects.values_list('id', flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_grade_grade_point_alter_grade_grade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gpa', models.FloatField(default=0.0)),
+                ('course_count', models.PositiveIntegerField(default=0)),
+                ('total_marks', models.FloatField(default=0.0)),
+                ('best_grade', models.CharField(blank=True, choices=[('A+', 'A+ (Outstanding)'), ('A', 'A (Excellent)'), ('B+', 'B+ (Very Good)'), ('B', 'B (Good)'), ('C+', 'C+ (Satisfactory)'), ('C', 'C (Acceptable)'), ('D+', 'D+ (Needs Improvement)'), ('D', 'D (Minimal)'), ('E', 'E (Insufficient)')], max_length=2)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='core.student')),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def pack_existing_attendance(apps, schema_editor):
+    from core.utils.attendance import pack_attendance
+
+    pack_attendance(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_studentsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term_start', models.DateField()),
+                ('recorded_days', models.BinaryField(default=b'')),
+                ('present_days', models.BinaryField(default=b'')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.student')),
+            ],
+            options={
+                'unique_together': {('student', 'course', 'term_start')},
+            },
+        ),
+        migrations.RunPython(pack_existing_attendance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other backends run without a search index
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE core_search_index USING fts5("
+        "title, detail, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    # Rank by bm25 with names weighted over codes/subjects, and both over the rest
+    schema_editor.execute(
+        "INSERT INTO core_search_index (core_search_index, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')"
+    )
+    schema_editor.execute(
+        "INSERT INTO core_search_index (rowid, title, detail, body) "
+        "SELECT id * 4 + 1, name, roll_no, email FROM core_student"
+    )
+    schema_editor.execute(
+        "INSERT INTO core_search_index (rowid, title, detail, body) "
+        "SELECT id * 4 + 2, name, subject, '' FROM core_teacher"
+    )
+    schema_editor.execute(
+        "INSERT INTO core_search_index (rowid, title, detail, body) "
+        "SELECT id * 4 + 3, name, code, COALESCE(description, '') FROM core_course"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS core_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_attendance_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
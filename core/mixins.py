@@ -0,0 +1,373 @@
+from functools import lru_cache
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import pre_delete
+from django.http import StreamingHttpResponse
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from .renderers import stream_json_array
+from .utils.response_cache import RESPONSE_CACHE_TIMEOUT, bump_data_version, response_cache_key
+
+
+def _collect_paths(serializer, prefix, select, prefetch, prefetching):
+    """Walk nested serializers, sorting relation paths into select/prefetch"""
+    for field in serializer._readable_fields:
+        if field.source == '*':
+            continue
+        path = prefix + field.source.replace('.', '__')
+
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.append(path)
+            _collect_paths(field.child, path + '__', select, prefetch, True)
+        elif isinstance(field, serializers.BaseSerializer):
+            (prefetch if prefetching else select).append(path)
+            _collect_paths(field, path + '__', select, prefetch, prefetching)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.append(path)
+
+
+@lru_cache(maxsize=256)
+def get_eager_loading_paths(serializer_class, fields='', expand=''):
+    """
+    (select_related, prefetch_related) paths needed to serialize
+    `serializer_class` without per-row queries, for the given ?fields= and
+    ?expand= values: nested single-object serializers become select_related
+    joins, nested many=True serializers and many-related fields become
+    prefetches. Relations emitted as bare primary keys need neither.
+    """
+    select, prefetch = [], []
+    _collect_paths(serializer_class(fields=fields, expand=expand), '', select, prefetch, False)
+    return tuple(select), tuple(prefetch)
+
+
+def eager_load(queryset, serializer_class, request=None):
+    """Apply the serializer's eager-loading paths (for this request's fields/expand) to a queryset"""
+    params = request.query_params if request is not None else {}
+    select, prefetch = get_eager_loading_paths(
+        serializer_class, params.get('fields', ''), params.get('expand', '')
+    )
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class EagerLoadingMixin:
+    """
+    ViewSet mixin that eager-loads every relation the serializer will embed
+    for this request, so list and detail endpoints run a constant number of
+    queries however many rows they return. Hooks into filter_queryset() so
+    it also applies to viewsets that override get_queryset() for role scoping.
+    """
+
+    def filter_queryset(self, queryset):
+        return eager_load(super().filter_queryset(queryset), self.get_serializer_class(), self.request)
+
+
+def _compile_row(serializer, prefix, paths):
+    """
+    Plan how to build `serializer`'s output from a values_list() row: a list
+    of (key, column index, to_representation) for plain fields and
+    (key, presence column index, nested plan) for nested serializers.
+    Column paths are appended to `paths`. Returns None for anything that
+    can't be read straight off columns (method fields, many-related
+    fields, dotted or '*' sources).
+    """
+    opts = serializer.Meta.model._meta
+    plan = []
+
+    def column(path):
+        if path not in paths:
+            paths.append(path)
+        return paths.index(path)
+
+    for field in serializer._readable_fields:
+        source = field.source
+        if source == '*' or '.' in source:
+            return None
+        if isinstance(field, serializers.ListSerializer) or isinstance(field, serializers.ManyRelatedField):
+            return None
+        if isinstance(field, serializers.BaseSerializer):
+            presence = column(prefix + opts.get_field(source).attname)
+            nested = _compile_row(field, prefix + source + '__', paths)
+            if nested is None:
+                return None
+            plan.append((field.field_name, presence, nested))
+        elif isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            plan.append((field.field_name, column(prefix + opts.get_field(source).attname), None))
+        elif isinstance(field, (serializers.RelatedField, serializers.SerializerMethodField)):
+            return None
+        else:
+            plan.append((field.field_name, column(prefix + source), field.to_representation))
+    return plan
+
+
+def _row_builder(plan):
+    def build(row):
+        data = {}
+        for key, index, convert in plan:
+            value = row[index]
+            if value is None:
+                data[key] = None
+            elif isinstance(convert, list):
+                data[key] = nested[key](row)
+            else:
+                data[key] = convert(value) if convert is not None else value
+        return data
+
+    nested = {key: _row_builder(convert) for key, _, convert in plan if isinstance(convert, list)}
+    return build
+
+
+@lru_cache(maxsize=256)
+def get_fast_list_plan(serializer_class, fields='', expand=''):
+    """
+    (values_list paths, row builder) that renders rows exactly as
+    `serializer_class` would for the given ?fields= and ?expand= values, or
+    None when the serializer has fields the fast path can't reproduce.
+    """
+    paths = []
+    plan = _compile_row(serializer_class(fields=fields, expand=expand), '', paths)
+    if plan is None:
+        return None
+    return tuple(paths), _row_builder(plan)
+
+
+class FastListMixin:
+    """
+    ViewSet mixin for read-heavy list endpoints: when `fast_list` is set,
+    list() reads plain values_list() rows and turns them into dicts with a
+    precompiled plan instead of building model instances and a serializer
+    per row. The output matches the serializer's for every ?fields= and
+    ?expand= combination it supports, and falls back to the normal
+    serializer path for the rest.
+
+    `?stream=1` skips pagination and streams the whole list as one JSON
+    array, read from the database a chunk at a time.
+    """
+    fast_list = True
+    stream_query_param = 'stream'
+    stream_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        plan = None
+        if self.fast_list:
+            plan = get_fast_list_plan(
+                self.get_serializer_class(),
+                request.query_params.get('fields', ''),
+                request.query_params.get('expand', ''),
+            )
+        if request.query_params.get(self.stream_query_param) in ('1', 'true'):
+            return self.stream_list(plan)
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        paths, build = plan
+        # The paginator reads its ordering key off the rows, so select it too
+        ordering = [name.lstrip('-') for name in getattr(self, 'pagination_ordering', ('id',))]
+        columns = list(paths) + [name for name in ordering if name not in paths]
+        rows = self.filter_queryset(self.get_queryset()).values_list(*columns, named=True)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([build(row) for row in page])
+        return Response([build(row) for row in rows])
+
+    def stream_list(self, plan):
+        queryset = self.filter_queryset(self.get_queryset()).order_by(
+            *getattr(self, 'pagination_ordering', ('id',))
+        )
+        if plan is None:
+            items = (
+                self.get_serializer(obj).data
+                for obj in queryset.iterator(chunk_size=self.stream_chunk_size)
+            )
+        else:
+            paths, build = plan
+            items = map(build, queryset.values_list(*paths).iterator(chunk_size=self.stream_chunk_size))
+        return StreamingHttpResponse(stream_json_array(items), content_type='application/json')
+
+
+class BulkUpsertMixin:
+    """
+    ViewSet mixin adding POST <list>/bulk/, which takes a JSON list of
+    objects in the serializer's input format and writes them all at once.
+
+    Every item is validated first, then the view's bulk_errors() hook runs
+    its set-based checks over the whole batch. If any item fails nothing is
+    written and the response (400) carries the errors per item. Otherwise
+    the batch is upserted on `bulk_unique_fields` with a single
+    bulk_create(update_conflicts=True) inside one transaction, updating
+    `bulk_update_fields`; with no update fields, rows that already exist are
+    left alone, including any inserted concurrently. bulk_create() sends no
+    signals, so views do their follow-up work in after_bulk_write(), inside
+    the same transaction.
+    """
+    bulk_unique_fields = ()
+    bulk_update_fields = ()
+    # Small enough that each table's rows go in one statement (SQLite allows
+    # 32766 variables, and the widest bulk-written row takes 5), so a bulk
+    # request runs the same number of queries whatever its size
+    bulk_max_items = 5000
+    # Rows per INSERT; None leaves it to the database's parameter limit
+    bulk_batch_size = None
+
+    def bulk_errors(self, objects):
+        """{index: [messages]} for items that may not be written; `objects` maps index to instance"""
+        return {}
+
+    def prepare_bulk(self, objects):
+        """Fill in derived fields on the unsaved instances before they are written"""
+
+    def after_bulk_write(self, objects):
+        """Runs inside the write transaction with the instances just written"""
+
+    def bulk_key(self, obj):
+        opts = obj._meta
+        return tuple(getattr(obj, opts.get_field(name).attname) for name in self.bulk_unique_fields)
+
+    def existing_bulk_rows(self, objects):
+        """{unique key: pk} for those of the given instances that are already stored"""
+        opts = self.get_serializer_class().Meta.model._meta
+        attnames = [opts.get_field(name).attname for name in self.bulk_unique_fields]
+        keys = {self.bulk_key(obj) for obj in objects}
+        first_values = sorted({key[0] for key in keys})
+        existing = {}
+        # Narrow by every key column, then match whole keys in Python. A
+        # request holds at most bulk_max_items objects, so this is one query
+        for start in range(0, len(first_values), self.bulk_max_items):
+            lookups = {f'{attnames[0]}__in': first_values[start:start + self.bulk_max_items]}
+            for position, attname in enumerate(attnames[1:], 1):
+                lookups[f'{attname}__in'] = {key[position] for key in keys}
+            for row in opts.model.objects.filter(**lookups).values_list('pk', *attnames):
+                if tuple(row[1:]) in keys:
+                    existing[tuple(row[1:])] = row[0]
+        return existing
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of objects.']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [f'At most {self.bulk_max_items} objects per request.']})
+
+        model = self.get_serializer_class().Meta.model
+        objects, errors, seen = {}, {}, set()
+        for index, item in enumerate(items):
+            serializer = self.get_serializer(data=item)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+            obj = model(**serializer.validated_data)
+            key = self.bulk_key(obj)
+            if key in seen:
+                errors[index] = {'non_field_errors': ['Duplicate of an earlier item in this request.']}
+                continue
+            seen.add(key)
+            objects[index] = obj
+
+        for index, messages in self.bulk_errors(objects).items():
+            errors[index] = {'non_field_errors': messages}
+            objects.pop(index, None)
+
+        if errors:
+            results = [
+                {'index': index, 'status': 'error', 'errors': errors[index]}
+                if index in errors else {'index': index, 'status': 'valid'}
+                for index in range(len(items))
+            ]
+            return Response({'written': 0, 'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            existing = self.existing_bulk_rows(objects.values()) if objects else {}
+            to_write = list(objects.values())
+            if not self.bulk_update_fields:
+                to_write = [obj for obj in to_write if self.bulk_key(obj) not in existing]
+
+            self.prepare_bulk(to_write)
+            if self.bulk_update_fields:
+                model.objects.bulk_create(
+                    to_write,
+                    batch_size=self.bulk_batch_size,
+                    update_conflicts=True,
+                    unique_fields=list(self.bulk_unique_fields),
+                    update_fields=list(self.bulk_update_fields),
+                )
+            elif to_write:
+                # A row inserted concurrently since the check above is left alone
+                model.objects.bulk_create(to_write, batch_size=self.bulk_batch_size, ignore_conflicts=True)
+                # ignore_conflicts leaves the primary keys unset
+                created = self.existing_bulk_rows(to_write)
+                for obj in to_write:
+                    obj.pk = created.get(self.bulk_key(obj))
+            self.after_bulk_write(to_write)
+            # bulk_create sends no signals, so bump the cached API data here
+            transaction.on_commit(lambda: bump_data_version(model._meta.model_name))
+
+        results = []
+        for index, obj in objects.items():
+            key = self.bulk_key(obj)
+            if key not in existing:
+                outcome = 'created'
+            else:
+                outcome = 'updated' if self.bulk_update_fields else 'unchanged'
+            results.append({'index': index, 'status': outcome, 'id': existing.get(key, obj.pk)})
+        return Response({'written': len(to_write), 'results': results})
+
+
+class CascadeDestroyMixin:
+    """
+    ViewSet mixin destroying a row that many others cascade from (a
+    course's attendance, say) with one DELETE per cascaded model.
+    Model.delete() loads every cascaded row of a model with delete receivers
+    and deletes them 100 primary keys at a time, a query per 100 rows. The
+    instance's pre_delete receivers run first, while the rows still exist,
+    then the rows of each model in `cascade_models` go without per-row
+    signals (their receivers skip cascades anyway), and the instance last.
+    Nothing may reference the rows of `cascade_models` in turn.
+    """
+    cascade_models = ()
+
+    def perform_destroy(self, instance):
+        model, using = type(instance), instance._state.db
+        with transaction.atomic(using=using):
+            pre_delete.send(sender=model, instance=instance, using=using, origin=instance)
+            for cascade_model in self.cascade_models:
+                fields = [field.name for field in cascade_model._meta.fields if field.related_model is model]
+                for name in fields:
+                    cascade_model.objects.filter(**{name: instance})._raw_delete(using)
+            instance.delete()
+
+
+class CachedResponseMixin:
+    """
+    ViewSet mixin caching list and retrieve responses per role and scoping
+    id (see core.utils.response_cache). `cache_dependencies` names every
+    model the endpoint's output or role scoping reads; a write to any of
+    them changes the cache key. Only 200 responses are cached, so each
+    scope goes through the normal permission checks before its first hit.
+    """
+    cache_dependencies = ()
+    cache_timeout = RESPONSE_CACHE_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        endpoint = f'{self.basename}:{self.action}'
+        key = response_cache_key(endpoint, request, self.cache_dependencies)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
@@ -1,5 +1,5 @@
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
 class Student(models.Model):
@@ -16,9 +16,12 @@ class Student(models.Model):
 	
 	@property
 	def gpa(self):
-		"""Calculate student's overall GPA"""
-		from core.utils.grading import calculate_student_gpa
-		return calculate_student_gpa(self)
+		"""Student's overall GPA, read from the persisted academic summary"""
+		try:
+			return self.summary.gpa
+		except StudentSummary.DoesNotExist:
+			from core.utils.grading import calculate_student_gpa
+			return calculate_student_gpa(self)
 
 class Teacher(models.Model):
 	user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -62,10 +65,101 @@ class Attendance(models.Model):
 
 	class Meta:
 		unique_together = ('student', 'course', 'date')
+		indexes = [
+			# Keyset pagination over (date, id), optionally within a course or student
+			models.Index(fields=['date', 'id'], name='attendance_date_id_idx'),
+			models.Index(fields=['course', 'date', 'id'], name='attendance_course_date_id_idx'),
+			models.Index(fields=['student', 'date', 'id'], name='attendance_student_date_id_idx'),
+		]
+
+	def save(self, *args, **kwargs):
+		# Signals update the attendance bitmaps and rollups; keep them in the same transaction
+		with transaction.atomic():
+			super().save(*args, **kwargs)
 
 	def __str__(self):
 		return f"{self.student} - {self.course} on {self.date}: {self.status}"
 
+class AttendanceRollup(models.Model):
+	"""Present/absent counts for a period, maintained alongside Attendance writes"""
+	present_count = models.PositiveIntegerField(default=0)
+	absent_count = models.PositiveIntegerField(default=0)
+
+	class Meta:
+		abstract = True
+
+	@property
+	def total_count(self):
+		return self.present_count + self.absent_count
+
+	@property
+	def percentage(self):
+		from core.utils.attendance import attendance_percentage
+		return attendance_percentage(self.present_count, self.total_count)
+
+class CourseDailyAttendance(AttendanceRollup):
+	course = models.ForeignKey(Course, on_delete=models.CASCADE)
+	date = models.DateField()
+
+	class Meta:
+		unique_together = ('course', 'date')
+
+	def __str__(self):
+		return f"{self.course} on {self.date}: {self.present_count}/{self.total_count}"
+
+class StudentMonthlyAttendance(AttendanceRollup):
+	student = models.ForeignKey(Student, on_delete=models.CASCADE)
+	month = models.DateField()  # first day of the month
+
+	class Meta:
+		unique_together = ('student', 'month')
+
+	def __str__(self):
+		return f"{self.student} in {self.month:%B %Y}: {self.present_count}/{self.total_count}"
+
+class CourseMonthlyAttendance(AttendanceRollup):
+	course = models.ForeignKey(Course, on_delete=models.CASCADE)
+	month = models.DateField()  # first day of the month
+
+	class Meta:
+		unique_together = ('course', 'month')
+
+	def __str__(self):
+		return f"{self.course} in {self.month:%B %Y}: {self.present_count}/{self.total_count}"
+
+class AttendanceBitmap(models.Model):
+	"""
+	Compact attendance history: one row per student, course and term.
+	Bit i of each bitset stands for the day term_start + i; see
+	core.utils.attendance for the encode/decode helpers.
+	"""
+	student = models.ForeignKey(Student, on_delete=models.CASCADE)
+	course = models.ForeignKey(Course, on_delete=models.CASCADE)
+	term_start = models.DateField()
+	recorded_days = models.BinaryField(default=b'')  # days attendance was taken
+	present_days = models.BinaryField(default=b'')  # days the student was present
+
+	class Meta:
+		unique_together = ('student', 'course', 'term_start')
+
+	@property
+	def total_count(self):
+		from core.utils.attendance import popcount
+		return popcount(self.recorded_days)
+
+	@property
+	def present_count(self):
+		from core.utils.attendance import popcount
+		return popcount(self.present_days)
+
+	@property
+	def percentage(self):
+		from core.utils.attendance import attendance_percentage
+		return attendance_percentage(self.present_count, self.total_count)
+
+	def __str__(self):
+		return f"{self.student} - {self.course} from {self.term_start}: {self.present_count}/{self.total_count}"
+
 class Grade(models.Model):
 	GRADE_CHOICES = [
 		('A+', 'A+ (Outstanding)'),
@@ -96,3 +190,19 @@ class Grade(models.Model):
 
 	def __str__(self):
 		return f"{self.student} - {self.course}: {self.grade} ({self.marks}%)"
+
+
+class StudentSummary(models.Model):
+	"""Per-student academic totals, kept up to date whenever a Grade changes"""
+	student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='summary')
+	gpa = models.FloatField(default=0.0)
+	course_count = models.PositiveIntegerField(default=0)
+	total_marks = models.FloatField(default=0.0)
+	best_grade = models.CharField(max_length=2, choices=Grade.GRADE_CHOICES, blank=True)
+
+	@property
+	def average_marks(self):
+		return self.total_marks / self.course_count if self.course_count else 0
+
+	def __str__(self):
+		return f"{self.student} - GPA {self.gpa}"
@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from django.contrib.auth.models import User, Group
+from .roles import role_of
 
 
 class IsAdmin(permissions.BasePermission):
@@ -17,7 +18,7 @@ class IsTeacher(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return hasattr(request.user, 'teacher')
+        return role_of(request.user).teacher_id is not None
 
 
 class IsStudent(permissions.BasePermission):
@@ -27,7 +28,7 @@ class IsStudent(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return hasattr(request.user, 'student')
+        return role_of(request.user).student_id is not None
 
 
 class IsTeacherOrAdmin(permissions.BasePermission):
@@ -37,7 +38,7 @@ class IsTeacherOrAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return request.user.is_staff or hasattr(request.user, 'teacher')
+        return request.user.is_staff or role_of(request.user).teacher_id is not None
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -48,15 +49,17 @@ class IsOwnerOrAdmin(permissions.BasePermission):
         if request.user.is_staff:
             return True
         
+        role = role_of(request.user)
+        
         # For student objects, only the student themselves can access
-        if hasattr(obj, 'user'):
-            return obj.user == request.user
+        if hasattr(obj, 'user_id'):
+            return obj.user_id == request.user.pk
         
         # For other objects linked to students/teachers
-        if hasattr(obj, 'student') and hasattr(request.user, 'student'):
-            return obj.student == request.user.student
+        if hasattr(obj, 'student_id') and role.student_id is not None:
+            return obj.student_id == role.student_id
         
-        if hasattr(obj, 'teacher') and hasattr(request.user, 'teacher'):
-            return obj.teacher == request.user.teacher
+        if hasattr(obj, 'teacher_id') and role.teacher_id is not None:
+            return obj.teacher_id == role.teacher_id
             
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,49 @@
+# Query budgets
+#
+# Every view declares the most database queries one request to it may run:
+# function views with the @query_budget(n) decorator, DRF views and
+# viewsets with a `query_budgets` dict mapping action names (list, retrieve,
+# create, bulk...) or, for plain APIViews, lower-cased HTTP methods to
+# limits. Views that declare nothing get settings.QUERY_BUDGET_DEFAULT.
+# core.middleware.QueryBudgetMiddleware counts each request's queries and
+# logs or raises when a view goes over. Budgets are for the whole request,
+# session and user lookups included, and must not depend on how many rows
+# the database holds.
+from django.conf import settings
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the most queries one request to the decorated view may run"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_query_budget(view_func, request):
+    """The declared budget of the view handling `request`, or the default"""
+    budget = getattr(view_func, 'query_budget', None)
+    view_class = getattr(view_func, 'cls', None)
+    if budget is None and view_class is not None:
+        method = request.method.lower()
+        # as_view() on a viewset records the method -> action mapping
+        action = (getattr(view_func, 'actions', None) or {}).get(method, method)
+        budget = getattr(view_class, 'query_budgets', {}).get(action)
+    if budget is None:
+        budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+    return budget
+
+
+class QueryCounter:
+    """Database execute wrapper that counts the queries run through it"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
@@ -0,0 +1,57 @@
+from typing import NamedTuple, Optional
+
+ADMIN = 'admin'
+TEACHER = 'teacher'
+STUDENT = 'student'
+NO_ROLE = 'none'
+
+
+class UserRole(NamedTuple):
+    """Who a user is to this app: role name plus their Teacher/Student ids"""
+    name: str
+    teacher_id: Optional[int] = None
+    student_id: Optional[int] = None
+
+    @property
+    def is_admin(self):
+        return self.name == ADMIN
+
+    @property
+    def is_teacher(self):
+        return self.name == TEACHER
+
+    @property
+    def is_student(self):
+        return self.name == STUDENT
+
+
+def make_role(is_staff, teacher_id=None, student_id=None):
+    # Staff take precedence, as they always have in the views
+    if is_staff:
+        name = ADMIN
+    elif teacher_id is not None:
+        name = TEACHER
+    elif student_id is not None:
+        name = STUDENT
+    else:
+        name = NO_ROLE
+    return UserRole(name, teacher_id, student_id)
+
+
+def role_of(user):
+    """
+    The user's UserRole, looked up with one query the first time and then
+    remembered on the user object. Users built from JWT claims (see
+    core.authentication) arrive with it already set.
+    """
+    role = getattr(user, '_user_role', None)
+    if role is not None:
+        return role
+    if not user.is_authenticated:
+        role = UserRole(NO_ROLE)
+    else:
+        from django.contrib.auth.models import User
+        ids = User.objects.filter(pk=user.pk).values('teacher__id', 'student__id').first() or {}
+        role = make_role(user.is_staff, ids.get('teacher__id'), ids.get('student__id'))
+    user._user_role = role
+    return role
@@ -0,0 +1,22 @@
+CACHE_DATABASE = 'cache'
+
+
+class CacheRouter:
+    """
+    Keeps the database cache's table in its own database (see CACHES in
+    settings), so cache reads and writes never touch the main database.
+    """
+
+    def _is_cache(self, model):
+        return model._meta.app_label == 'django_cache'
+
+    def db_for_read(self, model, **hints):
+        return CACHE_DATABASE if self._is_cache(model) else None
+
+    def db_for_write(self, model, **hints):
+        return CACHE_DATABASE if self._is_cache(model) else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'django_cache':
+            return db == CACHE_DATABASE
+        return db != CACHE_DATABASE
@@ -1,67 +1,134 @@
+import math
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Student, Teacher, Course, Enrollment, Attendance, Grade
 
 
-class UserSerializer(serializers.ModelSerializer):
+def parse_field_tree(value):
+    """Turn 'id,course.name,course.code' into {'id': {}, 'course': {'name': {}, 'code': {}}}"""
+    tree = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        node = tree
+        for part in item.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets and on-demand expansion for model serializers.
+
+    `?fields=id,marks,grade` limits the output to those fields and
+    `?expand=student,course.teacher` embeds the listed relations (dotted
+    paths expand deeper). Relations named in `expandable_fields` that are
+    not expanded are emitted as bare primary keys. Nested serializers get
+    their part of the tree passed in as `fields`/`expand` instead of reading
+    the request; both accept a query-string value or an already parsed tree.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._field_tree = fields
+        self._expand_tree = expand
+
+    def _tree(self, param, explicit):
+        if explicit is None:
+            request = self.context.get('request')
+            explicit = request.query_params.get(param, '') if request is not None else ''
+        return parse_field_tree(explicit) if isinstance(explicit, str) else explicit
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only = self._tree('fields', self._field_tree)
+        expand = self._tree('expand', self._expand_tree)
+
+        for name, serializer_class in self.expandable_fields.items():
+            if name not in fields:
+                continue
+            if name in expand:
+                fields[name] = serializer_class(read_only=True, fields=only.get(name, {}), expand=expand[name])
+            else:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+        return fields
+
+    @property
+    def _readable_fields(self):
+        # ?fields= only shapes the output; every field still accepts input
+        only = self._tree('fields', self._field_tree)
+        for field in super()._readable_fields:
+            if not only or field.field_name in only:
+                yield field
+
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
 
-class StudentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    
+class StudentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': UserSerializer}
+
     class Meta:
         model = Student
         fields = ['id', 'user', 'name', 'email', 'roll_no', 'student_class', 'date_of_birth', 'gender']
 
 
-class TeacherSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    
+class TeacherSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': UserSerializer}
+
     class Meta:
         model = Teacher
         fields = ['id', 'user', 'name', 'subject', 'email', 'phone']
 
 
-class CourseSerializer(serializers.ModelSerializer):
-    teacher = TeacherSerializer(read_only=True)
+class CourseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'teacher': TeacherSerializer}
     teacher_id = serializers.IntegerField(write_only=True, required=False)
-    
+
     class Meta:
         model = Course
         fields = ['id', 'name', 'code', 'description', 'teacher', 'teacher_id']
 
 
-class EnrollmentSerializer(serializers.ModelSerializer):
-    student = StudentSerializer(read_only=True)
-    course = CourseSerializer(read_only=True)
+class EnrollmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'student': StudentSerializer, 'course': CourseSerializer}
     student_id = serializers.IntegerField(write_only=True)
     course_id = serializers.IntegerField(write_only=True)
-    
+
     class Meta:
         model = Enrollment
         fields = ['id', 'student', 'course', 'date_joined', 'student_id', 'course_id']
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
-    student = StudentSerializer(read_only=True)
-    course = CourseSerializer(read_only=True)
+class AttendanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'student': StudentSerializer, 'course': CourseSerializer}
     student_id = serializers.IntegerField(write_only=True)
     course_id = serializers.IntegerField(write_only=True)
-    
+
     class Meta:
         model = Attendance
         fields = ['id', 'student', 'course', 'date', 'status', 'student_id', 'course_id']
 
 
-class GradeSerializer(serializers.ModelSerializer):
-    student = StudentSerializer(read_only=True)
-    course = CourseSerializer(read_only=True)
+class GradeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'student': StudentSerializer, 'course': CourseSerializer}
     student_id = serializers.IntegerField(write_only=True)
     course_id = serializers.IntegerField(write_only=True)
-    
+
     class Meta:
         model = Grade
-        fields = ['id', 'student', 'course', 'marks', 'grade', 'grade_point', 'student_id', 'course_id']
\ No newline at end of file
+        fields = ['id', 'student', 'course', 'marks', 'grade', 'grade_point', 'student_id', 'course_id']
+        # Both are derived from marks on save
+        read_only_fields = ['grade', 'grade_point']
+
+    def validate_marks(self, value):
+        if not math.isfinite(value):
+            raise serializers.ValidationError('Marks must be a finite number.')
+        return value
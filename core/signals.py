@@ -0,0 +1,231 @@
+import sqlite3
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import Student, Teacher, Course, Enrollment, Attendance, Grade
+from .utils.attendance import record_attendance, update_attendance_rollups
+from .utils.grading import rebuild_student_summaries, update_student_summary
+from .utils.rankings import invalidate_rankings
+from .utils.rosters import invalidate_course_rosters
+from .utils.response_cache import bump_data_version
+from .utils.search import index_instance, remove_instance
+
+
+@receiver(connection_created)
+def use_sqlite_variable_limit(sender, connection, **kwargs):
+    """
+    Django assumes SQLite's old limit of 999 variables per statement and
+    splits bulk_create()/bulk_update() to match, so a 10k-row bulk write
+    took 40 INSERTs per table. Builds since 3.32 allow 32766; use the real
+    limit so one statement per table covers a whole bulk API request.
+    """
+    if connection.vendor == 'sqlite':
+        connection.features.max_query_params = connection.connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+
+
+def _student_class(student_id):
+    return Student.objects.filter(pk=student_id).values_list('student_class', flat=True).first()
+
+
+def _cascaded(sender, origin):
+    """
+    Whether a row is going as part of deleting something else. Attendance,
+    grades and enrollments only cascade from a Student or Course, whose
+    receivers below refresh everything the rows fed in one go.
+    """
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not sender
+
+
+def _moved_from(sender, instance, key_fields, update_fields=None):
+    """
+    An unsaved copy of the stored row with its old `key_fields`, when an
+    update is about to change any of them; None for inserts and for updates
+    that keep the key.
+    """
+    if instance._state.adding or instance.pk is None:
+        return None
+    if update_fields is not None:
+        names = set(key_fields) | {name.removesuffix('_id') for name in key_fields}
+        if not names & set(update_fields):
+            return None
+    stored = sender.objects.filter(pk=instance.pk).values(*key_fields).first()
+    if stored is None or all(stored[name] == getattr(instance, name) for name in key_fields):
+        return None
+    return sender(**stored)
+
+
+@receiver(pre_save, sender=Grade)
+def grade_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember the student and course of a grade an update reassigns"""
+    instance._moved_from = _moved_from(sender, instance, ('student_id', 'course_id'), update_fields)
+
+
+@receiver(post_save, sender=Grade)
+def grade_saved(sender, instance, **kwargs):
+    """Keep the student's academic summary and rankings in step with their grades"""
+    update_student_summary(instance.student_id)
+    student_ids, course_ids = {instance.student_id}, {instance.course_id}
+    moved_from = getattr(instance, '_moved_from', None)
+    if moved_from is not None:
+        if moved_from.student_id != instance.student_id:
+            update_student_summary(moved_from.student_id, create=False)
+        student_ids.add(moved_from.student_id)
+        course_ids.add(moved_from.course_id)
+    invalidate_rankings(
+        set(Student.objects.filter(pk__in=student_ids).values_list('student_class', flat=True)), course_ids,
+    )
+
+
+@receiver(post_delete, sender=Grade)
+def grade_deleted(sender, instance, origin=None, **kwargs):
+    if _cascaded(sender, origin):
+        return
+    update_student_summary(instance.student_id, create=False)
+    invalidate_rankings([_student_class(instance.student_id)], [instance.course_id])
+
+
+@receiver(pre_save, sender=Student)
+def student_class_changing(sender, instance, **kwargs):
+    """A student moving class changes the rankings of both classes"""
+    if instance.pk:
+        old_class = _student_class(instance.pk)
+        if old_class is not None and old_class != instance.student_class:
+            invalidate_rankings([old_class])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def student_changed(sender, instance, **kwargs):
+    invalidate_rankings([instance.student_class])
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, created, **kwargs):
+    """Course rosters show the student's name, roll number and class"""
+    if not created:
+        invalidate_course_rosters(
+            Enrollment.objects.filter(student_id=instance.pk).values_list('course_id', flat=True)
+        )
+
+
+@receiver(pre_save, sender=Enrollment)
+def enrollment_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember the course of an enrollment an update moves"""
+    instance._moved_from = _moved_from(sender, instance, ('course_id',), update_fields)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def enrollment_changed(sender, instance, origin=None, **kwargs):
+    if _cascaded(sender, origin):
+        return
+    moved_from = getattr(instance, '_moved_from', None)
+    invalidate_course_rosters([instance.course_id] + ([moved_from.course_id] if moved_from is not None else []))
+
+
+@receiver(pre_save, sender=Attendance)
+def attendance_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember where an updated record used to be, in case the update moves it"""
+    instance._moved_from = _moved_from(sender, instance, ('student_id', 'course_id', 'date'), update_fields)
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, **kwargs):
+    """Mirror daily attendance into the compact per-term bitmaps and the rollups"""
+    moved_from = [instance._moved_from] if getattr(instance, '_moved_from', None) else []
+    record_attendance([instance], moved_from=moved_from)
+    update_attendance_rollups([instance])
+    if moved_from:
+        update_attendance_rollups(moved_from, deleted=True)
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, origin=None, **kwargs):
+    if _cascaded(sender, origin):
+        return
+    record_attendance([instance], deleted=True)
+    update_attendance_rollups([instance], deleted=True)
+
+
+@receiver(pre_delete, sender=Student)
+@receiver(pre_delete, sender=Course)
+def school_record_deleting(sender, instance, **kwargs):
+    """
+    Deleting a student or course cascades to their attendance, grades and
+    enrollments without the per-row receivers (see _cascaded). Note what
+    those rows feed, a query per model, to refresh once they are gone.
+    CascadeDestroyMixin sends this before removing the rows itself, and
+    that first note stands.
+    """
+    if hasattr(instance, '_cascade'):
+        return
+    rows = {f'{sender._meta.model_name}_id': instance.pk}
+    attendance = Attendance.objects.filter(**rows).values_list('student_id', 'course_id', 'date', named=True)
+    grades = Grade.objects.filter(**rows).values_list('student_id', 'course_id', 'student__student_class')
+    instance._cascade = {
+        'attendance': list(attendance),
+        'grades': list(grades),
+        'enrolled_courses': list(Enrollment.objects.filter(**rows).values_list('course_id', flat=True)),
+    }
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Course)
+def school_record_deleted(sender, instance, **kwargs):
+    cascade = getattr(instance, '_cascade', None)
+    if cascade is None:
+        return
+    # Bitmaps, and the deleted row's own rollups and summary, went with the cascade
+    update_attendance_rollups(cascade['attendance'], deleted=True)
+    rebuild_student_summaries({student_id for student_id, _, _ in cascade['grades']})
+    invalidate_rankings(
+        {student_class for _, _, student_class in cascade['grades']},
+        {course_id for _, course_id, _ in cascade['grades']},
+    )
+    invalidate_course_rosters(cascade['enrolled_courses'])
+    transaction.on_commit(lambda: bump_data_version('enrollment', 'attendance', 'grade'))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Course)
+def searchable_saved(sender, instance, **kwargs):
+    """Keep the full-text search index in step, inside the same transaction"""
+    index_instance(instance)
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Course)
+def searchable_deleted(sender, instance, **kwargs):
+    remove_instance(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=Attendance)
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_delete, sender=Attendance)
+@receiver(post_delete, sender=Grade)
+def api_data_changed(sender, update_fields=None, origin=None, **kwargs):
+    """Expire cached API responses that read the changed model, once the write is committed"""
+    if sender is User and update_fields is not None and set(update_fields) <= {'last_login'}:
+        return  # logins don't change anything the API returns
+    if sender in (Enrollment, Attendance, Grade) and _cascaded(sender, origin):
+        return  # bumped once by school_record_deleted
+    transaction.on_commit(lambda: bump_data_version(sender._meta.model_name))
@@ -1,3 +1,1392 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import io
+import json
+import math
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import views
+from .authentication import RoleTokenObtainPairSerializer
+from .checks import check_shared_cache
+from .middleware import ROLE_SESSION_KEY
+from .mixins import get_fast_list_plan
+from .models import (
+    Attendance, AttendanceBitmap, Course, CourseDailyAttendance, CourseMonthlyAttendance, Enrollment, Grade, Student,
+    StudentMonthlyAttendance, StudentSummary, Teacher,
+)
+from .pagination import KeysetPagination
+from .query_budget import QueryBudgetExceeded
+from .serializers import AttendanceSerializer, EnrollmentSerializer, GradeSerializer
+from .utils.attendance import (
+    bits_to_int, decode_days, encode_days, get_attendance_stats, pack_attendance, popcount, rebuild_attendance_rollups,
+    record_attendance,
+)
+from .utils import grading
+from .utils.grading import (
+    calculate_nepali_grade, calculate_nepali_grades, calculate_student_gpa, rebuild_student_summaries,
+)
+from .utils.rankings import class_rankings_cache_key, course_rankings_cache_key
+from .utils.response_cache import bump_data_version, get_data_versions
+from .utils.rosters import get_course_roster
+
+PASSWORD = 'budget-pass'
+
+# Large enough that any per-row query blows every budget
+TEACHERS = 5
+COURSES_PER_TEACHER = 2
+STUDENTS = 60
+COURSES_PER_STUDENT = 3
+ATTENDANCE_DAYS = 5
+FIRST_DAY = datetime.date(2026, 1, 5)
+
+
+def core_url_names():
+    """Names of every URL pattern under core/urls.py, the API router's included"""
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                names.add(pattern.name)
+
+    walk(get_resolver('core.urls').url_patterns)
+    return names
+
+
+def core_api_actions():
+    """(URL name, HTTP method) for every action the API router maps, HEAD aside as it runs GET's action"""
+    actions = set()
+    for pattern in get_resolver('core.urls').url_patterns:
+        if isinstance(pattern, URLResolver):
+            for route in pattern.url_patterns:
+                for method in getattr(route.callback, 'actions', None) or {}:
+                    if method != 'head':
+                        actions.add((route.name, method))
+    return actions
+
+
+def add_students(count, courses=()):
+    """Insert `count` students, enrolled in `courses`, with bulk_create (no signals)"""
+    first = Student.objects.count()
+    users = User.objects.bulk_create([User(username=f'bulk{first + s}') for s in range(count)])
+    students = Student.objects.bulk_create([
+        Student(
+            user=user, name=f'Bulk {first + s}', email=f'bulk{first + s}@school.test', roll_no=f'B{first + s:05d}',
+            student_class='11A', date_of_birth=datetime.date(2010, 1, 1), gender='Male',
+        )
+        for s, user in enumerate(users)
+    ])
+    Enrollment.objects.bulk_create([Enrollment(student=student, course=course) for student in students for course in courses])
+    return students
+
+
+class GradingTests(SimpleTestCase):
+    BOUNDARIES = [
+        (0, 'E', 0.8), (31.99, 'E', 0.8), (32, 'D', 1.2), (34.99, 'D', 1.2), (35, 'D+', 1.6),
+        (39.99, 'D+', 1.6), (40, 'C', 2.0), (50, 'C+', 2.4), (60, 'B', 2.8), (70, 'B+', 3.2),
+        (79.99, 'B+', 3.2), (80, 'A', 3.6), (89.99, 'A', 3.6), (90, 'A+', 4.0), (100, 'A+', 4.0),
+    ]
+
+    def test_boundaries(self):
+        for marks, letter, point in self.BOUNDARIES:
+            with self.subTest(marks=marks):
+                self.assertEqual(calculate_nepali_grade(marks), (letter, point))
+
+    def assertBatchMatchesSingle(self):
+        marks = [marks for marks, _, _ in self.BOUNDARIES]
+        letters, points = calculate_nepali_grades(marks)
+        self.assertEqual(list(zip(letters, points)), [(letter, point) for _, letter, point in self.BOUNDARIES])
+        self.assertEqual(calculate_nepali_grades(iter(marks[:3])), (['E', 'E', 'D'], [0.8, 0.8, 1.2]))
+        for bad in (math.nan, math.inf, -math.inf):
+            with self.subTest(marks=bad), self.assertRaises(ValueError):
+                calculate_nepali_grades([75, bad])
+
+    def test_batch_matches_single(self):
+        with mock.patch.object(grading, 'np', None):
+            self.assertBatchMatchesSingle()
+
+    @skipUnless(grading.np, 'NumPy is not installed')
+    def test_numpy_batch_matches_single(self):
+        self.assertBatchMatchesSingle()
+        letters, points = calculate_nepali_grades(grading.np.array([31.99, 90.0]))
+        self.assertEqual((letters, points), (['E', 'A+'], [0.8, 4.0]))
+
+    def test_non_finite_marks_are_rejected(self):
+        for marks in (math.nan, math.inf, -math.inf):
+            with self.subTest(marks=marks):
+                with self.assertRaises(ValueError):
+                    calculate_nepali_grade(marks)
+
+
+class SchoolTestCase(TestCase):
+    """A small school: two teachers (one without courses), two courses, eight students"""
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password=PASSWORD)
+        cls.teacher = Teacher.objects.create(
+            user=User.objects.create_user('teacher', password=PASSWORD),
+            name='Teacher', subject='Maths', email='teacher@school.test', phone='98000000',
+        )
+        cls.idle_teacher = Teacher.objects.create(
+            user=User.objects.create_user('idle', password=PASSWORD),
+            name='Idle Teacher', subject='Art', email='idle@school.test', phone='98000001',
+        )
+        cls.courses = [
+            Course.objects.create(name=f'Course {c}', code=f'C{c}', description='', teacher=cls.teacher)
+            for c in range(2)
+        ]
+        cls.students = []
+        for s in range(8):
+            student = Student.objects.create(
+                user=User.objects.create_user(f'student{s}', password=PASSWORD),
+                name=f'Student {s}', email=f'student{s}@school.test', roll_no=f'R{s:02d}',
+                student_class='10A' if s % 2 else '10B', date_of_birth=datetime.date(2010, 1, 1), gender='Female',
+            )
+            cls.students.append(student)
+            for c, course in enumerate(cls.courses):
+                Enrollment.objects.create(student=student, course=course)
+                # Repeated marks, so rankings and orderings have ties
+                Grade.objects.create(student=student, course=course, marks=50 + (s % 3) * 10 + c)
+                for day in range(3):
+                    Attendance.objects.create(
+                        student=student, course=course, date=FIRST_DAY + datetime.timedelta(days=day),
+                        status='Absent' if (s + day) % 3 == 0 else 'Present',
+                    )
+
+    def setUp(self):
+        cache.clear()
+
+    def api(self, user):
+        token = RoleTokenObtainPairSerializer.get_token(user).access_token
+        return self.client_class(headers={'Authorization': f'Bearer {token}'})
+
+
+class RankingsTests(SchoolTestCase):
+
+    def test_teacher_without_courses_sees_no_class_rankings(self):
+        response = self.api(self.idle_teacher.user).get('/api/students/rankings/?class=10A')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rankings'], [])
+
+    def test_teacher_cannot_see_another_teachers_course_rankings(self):
+        response = self.api(self.idle_teacher.user).get(f'/api/courses/{self.courses[0].id}/rankings/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_course_teacher_and_admin_see_full_rankings(self):
+        for user in (self.teacher.user, self.admin):
+            response = self.api(user).get(f'/api/courses/{self.courses[0].id}/rankings/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['rankings']), 8)
+        response = self.api(self.admin).get('/api/students/rankings/?class=10A')
+        self.assertEqual(len(response.json()['rankings']), 4)
+
+
+class NonFiniteMarksTests(SchoolTestCase):
+
+    def test_grade_api_rejects_nan(self):
+        grade = Grade.objects.filter(course=self.courses[0]).first()
+        api = self.api(self.teacher.user)
+        response = api.patch(f'/api/grades/{grade.id}/', {'marks': 'nan'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = api.post('/api/grades/bulk/', [
+            {'student_id': self.students[0].id, 'course_id': self.courses[0].id, 'marks': 'inf'},
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Grade.objects.filter(marks__gt=100).exists())
+
+    def test_grade_calculator_rejects_nan(self):
+        self.client.force_login(self.teacher.user)
+        self.assertEqual(self.client.post('/calculate-grade/', {'marks': 'nan'}).status_code, 400)
+        self.assertEqual(self.client.post('/calculate-grade/', {'marks': ['80', 'inf']}).status_code, 400)
+
+    def test_bulk_grade_entry_skips_nan(self):
+        self.client.force_login(self.teacher.user)
+        student = self.students[0]
+        before = Grade.objects.get(student=student, course=self.courses[0]).marks
+        self.client.post(f'/grades/bulk/{self.courses[0].id}/', {f'marks_{student.id}': 'nan'})
+        self.assertEqual(Grade.objects.get(student=student, course=self.courses[0]).marks, before)
+
+
+class TokenRefreshTests(SchoolTestCase):
+
+    def obtain(self, username):
+        response = self.client.post('/api/token/', {'username': username, 'password': PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def refresh(self, refresh_token):
+        return self.client.post('/api/token/refresh/', {'refresh': refresh_token})
+
+    def test_refresh_picks_up_a_demotion(self):
+        staff = User.objects.create_user('staff', password=PASSWORD, is_staff=True)
+        tokens = self.obtain('staff')
+        staff.is_staff = False
+        staff.save()
+
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.json()['access'])
+        self.assertEqual(access['role'], 'none')
+        self.assertFalse(access['is_staff'])
+        rotated = RefreshToken(response.json()['refresh'])
+        self.assertFalse(rotated['is_staff'])
+
+        api = self.client_class(headers={'Authorization': f'Bearer {response.json()["access"]}'})
+        self.assertEqual(api.get('/api/teachers/').status_code, 403)
+
+    def test_refresh_refuses_inactive_users(self):
+        tokens = self.obtain('student0')
+        self.students[0].user.is_active = False
+        self.students[0].user.save()
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+    def test_refresh_keeps_current_role(self):
+        tokens = self.obtain('teacher')
+        access = AccessToken(self.refresh(tokens['refresh']).json()['access'])
+        self.assertEqual((access['role'], access['teacher_id']), ('teacher', self.teacher.id))
+
+
+class SessionRoleTests(SchoolTestCase):
+
+    def test_profile_created_by_another_worker_re_resolves_the_role(self):
+        user = User.objects.create_user('newcomer', password=PASSWORD)
+        self.client.force_login(user)
+        self.client.get('/dashboard/')
+        self.assertIsNone(self.client.session[ROLE_SESSION_KEY]['teacher_id'])
+
+        # The version bump goes through another process's handle on the cache
+        other_worker = caches.create_connection('default')
+        with mock.patch('core.utils.response_cache.cache', other_worker), \
+                self.captureOnCommitCallbacks(execute=True):
+            teacher = Teacher.objects.create(
+                user=user, name='Newcomer', subject='Music', email='new@school.test', phone='98000002',
+            )
+        self.client.get('/dashboard/')
+        self.assertEqual(self.client.session[ROLE_SESSION_KEY]['teacher_id'], teacher.id)
+
+    def test_per_process_cache_is_flagged(self):
+        self.assertEqual(check_shared_cache(None), [])
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['core.W001'])
+
+
+class FastListTests(SchoolTestCase):
+    """The fast list path renders exactly what serializer(many=True).data would, key order included"""
+
+    # (?fields=, ?expand=)
+    COMBINATIONS = [
+        ('', ''),
+        ('id,course_id', ''),
+        ('', 'student'),
+        ('', 'student,course.teacher'),
+        ('id,course.name,course.code', 'course'),
+        ('id,student.name,student.user', 'student.user'),
+    ]
+    ENDPOINTS = [
+        ('grades', GradeSerializer, lambda: Grade.objects.order_by('id')),
+        ('attendance', AttendanceSerializer, lambda: Attendance.objects.order_by('date', 'id')),
+    ]
+
+    def expected(self, serializer_class, queryset, fields, expand):
+        data = serializer_class(queryset, many=True, fields=fields, expand=expand).data
+        return self.shape(json.loads(JSONRenderer().render(data)))
+
+    def shape(self, rows):
+        # Lists of (key, value) pairs, so key order is compared too
+        return [[(key, self.shape([value])[0] if isinstance(value, dict) else value) for key, value in row.items()]
+                for row in rows]
+
+    def test_api_lists_match_the_serializers(self):
+        api = self.api(self.admin)
+        for path, serializer_class, queryset in self.ENDPOINTS:
+            for fields, expand in self.COMBINATIONS:
+                with self.subTest(path=path, fields=fields, expand=expand):
+                    self.assertIsNotNone(get_fast_list_plan(serializer_class, fields, expand))
+                    response = api.get(f'/api/{path}/', {'fields': fields, 'expand': expand, 'page_size': 500})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(
+                        self.shape(response.json()['results']),
+                        self.expected(serializer_class, queryset(), fields, expand),
+                    )
+
+    def test_streamed_lists_match_the_serializers(self):
+        api = self.api(self.admin)
+        for path, serializer_class, queryset in self.ENDPOINTS:
+            for fields, expand in (self.COMBINATIONS[0], self.COMBINATIONS[3]):
+                with self.subTest(path=path, fields=fields, expand=expand):
+                    response = api.get(f'/api/{path}/', {'fields': fields, 'expand': expand, 'stream': 1})
+                    self.assertTrue(response.streaming)
+                    streamed = json.loads(b''.join(response.streaming_content))
+                    self.assertEqual(self.shape(streamed), self.expected(serializer_class, queryset(), fields, expand))
+
+    def test_enrollment_plans_match_the_serializer(self):
+        queryset = Enrollment.objects.order_by('id')
+        for fields, expand in self.COMBINATIONS:
+            with self.subTest(fields=fields, expand=expand):
+                paths, build = get_fast_list_plan(EnrollmentSerializer, fields, expand)
+                rows = [build(row) for row in queryset.values_list(*paths)]
+                self.assertEqual(
+                    self.shape(json.loads(JSONRenderer().render(rows))),
+                    self.expected(EnrollmentSerializer, queryset, fields, expand),
+                )
+
+
+class KeysetPaginationTests(SchoolTestCase):
+
+    def walk(self, api, url):
+        """Ids of every row, following next links from `url`"""
+        ids, pages = [], 0
+        while url:
+            response = api.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.json()['results'])
+            url = response.json()['next']
+            pages += 1
+        return ids, pages
+
+    def test_every_row_once_across_tied_dates(self):
+        api = self.api(self.admin)
+        # 48 rows over three dates, so most rows tie on the leading key
+        ids, pages = self.walk(api, '/api/attendance/?page_size=5')
+        self.assertEqual(ids, list(Attendance.objects.order_by('date', 'id').values_list('id', flat=True)))
+        self.assertEqual(pages, 10)
+
+        ids, _ = self.walk(api, f'/api/attendance/?page_size=7&course={self.courses[1].id}')
+        expected = Attendance.objects.filter(course=self.courses[1]).order_by('date', 'id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+        ids, _ = self.walk(api, '/api/grades/?page_size=3')
+        self.assertEqual(ids, list(Grade.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_descending_key_with_ties(self):
+        view = mock.Mock(pagination_ordering=('-date', 'id'))
+        paginator = KeysetPagination()
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 4, **({'cursor': cursor} if cursor else {})}
+            request = Request(APIRequestFactory().get('/api/attendance/', params))
+            seen.extend(row.id for row in paginator.paginate_queryset(Attendance.objects.all(), request, view))
+            if not paginator.has_next:
+                break
+            cursor = paginator.encode_cursor(paginator.next_position)
+        self.assertEqual(seen, list(Attendance.objects.order_by('-date', 'id').values_list('id', flat=True)))
+
+    def test_malformed_cursors_are_not_found(self):
+        def encode(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        api = self.api(self.admin)
+        for cursor in ('not-a-cursor', encode(['2026-01-05']), encode(['yesterday', '1']), encode({'id': 1})):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(api.get('/api/attendance/', {'cursor': cursor}).status_code, 404)
+
+
+class StudentSummaryTests(SchoolTestCase):
+
+    def assertSummaryMatchesGrades(self, student):
+        summary = StudentSummary.objects.get(student=student)
+        self.assertEqual(summary.gpa, calculate_student_gpa(student))
+        self.assertEqual(summary.course_count, Grade.objects.filter(student=student).count())
+
+    def test_summary_follows_grade_create_update_and_delete(self):
+        student = self.students[0]
+        course = Course.objects.create(name='Course 2', code='C2', description='', teacher=self.teacher)
+        grade = Grade.objects.create(student=student, course=course, marks=95)
+        self.assertSummaryMatchesGrades(student)
+        self.assertEqual(StudentSummary.objects.get(student=student).best_grade, 'A+')
+        grade.marks = 20
+        grade.save()
+        self.assertSummaryMatchesGrades(student)
+        grade.delete()
+        self.assertSummaryMatchesGrades(student)
+        self.assertEqual(StudentSummary.objects.get(student=student).course_count, 2)
+
+    def test_reassigned_grade_refreshes_both_students_and_courses(self):
+        old_student, new_student = self.students[0], self.students[1]
+        course = Course.objects.create(name='Course 2', code='C2', description='', teacher=self.teacher)
+        grade = Grade.objects.create(student=old_student, course=course, marks=95)
+        keys = [class_rankings_cache_key(old_student.student_class), course_rankings_cache_key(course.id),
+                course_rankings_cache_key(self.courses[0].id)]
+        cache.set_many(dict.fromkeys(keys, []))
+
+        api = self.api(self.admin)
+        response = api.patch(f'/api/grades/{grade.id}/', {'student_id': new_student.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertSummaryMatchesGrades(old_student)
+        self.assertSummaryMatchesGrades(new_student)
+        self.assertEqual(StudentSummary.objects.get(student=old_student).course_count, 2)
+        self.assertEqual(cache.get_many(keys[:2]), {})
+
+        Grade.objects.filter(student=new_student, course=self.courses[0]).delete()
+        cache.set_many(dict.fromkeys(keys, []))
+        response = api.patch(f'/api/grades/{grade.id}/', {'course_id': self.courses[0].id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cache.get_many(keys[1:]), {})
+
+    def test_rebuild_matches_calculate_student_gpa(self):
+        Grade.objects.filter(student=self.students[0], course=self.courses[0]).update(grade='A+', grade_point=4.0)
+        Grade.objects.filter(student=self.students[1]).delete()
+        StudentSummary.objects.update(gpa=0, course_count=0)
+        self.assertEqual(rebuild_student_summaries(), len(self.students))
+        for student in self.students:
+            with self.subTest(student=student.roll_no):
+                self.assertSummaryMatchesGrades(student)
+
+
+class RecalculateGradesTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Stale letters, as if the grading scale had changed; update() skips the summaries
+        Grade.objects.update(grade='E', grade_point=0.8)
+        rebuild_student_summaries()
+
+    def recalculate(self, *args):
+        out = io.StringIO()
+        call_command('recalculate_grades', *args, stdout=out)
+        return out.getvalue()
+
+    def stale(self):
+        return set(Grade.objects.filter(grade='E').values_list('student__student_class', 'course__code'))
+
+    def test_dry_run_writes_nothing(self):
+        output = self.recalculate('--dry-run')
+        self.assertIn('16 would change, 0 unchanged', output)
+        self.assertEqual(len(self.stale()), 4)
+        self.assertEqual(StudentSummary.objects.get(student=self.students[0]).gpa, 0.8)
+
+    def test_course_and_class_filters(self):
+        self.recalculate('--course', 'C0', '--chunk-size', '3')
+        self.assertEqual(self.stale(), {('10A', 'C1'), ('10B', 'C1')})
+        self.recalculate('--class', '10A')
+        self.assertEqual(self.stale(), {('10B', 'C1')})
+        output = self.recalculate()
+        self.assertIn('4 changed, 12 unchanged', output)
+        self.assertEqual(self.stale(), set())
+
+    def test_summaries_and_rankings_follow_each_chunk(self):
+        cache.set(course_rankings_cache_key(self.courses[0].id), [])
+        self.recalculate('--chunk-size', '5')
+        for student in self.students:
+            self.assertEqual(StudentSummary.objects.get(student=student).gpa, calculate_student_gpa(student))
+        self.assertIsNone(cache.get(course_rankings_cache_key(self.courses[0].id)))
+        self.assertEqual(rebuild_student_summaries([student.id for student in self.students], batch_size=3), 8)
+
+    def test_unknown_course(self):
+        with self.assertRaises(CommandError):
+            self.recalculate('--course', 'NOPE')
+
+
+class AttendanceBitsTests(SimpleTestCase):
+    TERM = datetime.date(2026, 1, 1)
+
+    def test_round_trip(self):
+        days = [self.TERM, self.TERM + datetime.timedelta(days=7), self.TERM + datetime.timedelta(days=8),
+                datetime.date(2026, 12, 31)]
+        bits = encode_days(reversed(days), self.TERM)
+        self.assertEqual(len(bits), 46)  # bit 364 is the last one set
+        self.assertEqual(decode_days(bits, self.TERM), days)
+        self.assertEqual(popcount(bits), 4)
+
+    def test_empty(self):
+        self.assertEqual(encode_days([], self.TERM), b'')
+        self.assertEqual(decode_days(b'', self.TERM), [])
+        self.assertEqual(popcount(b''), 0)
+        self.assertEqual(popcount(None), 0)
+
+
+class AttendanceBitmapTests(SchoolTestCase):
+
+    def bitmaps(self):
+        # Bitmaps cleared down to no days are left in place; pack_attendance() doesn't write them
+        return {
+            (bitmap.student_id, bitmap.course_id, bitmap.term_start):
+                (bits_to_int(bitmap.recorded_days), bits_to_int(bitmap.present_days))
+            for bitmap in AttendanceBitmap.objects.all()
+            if bits_to_int(bitmap.recorded_days)
+        }
+
+    def assertBitmapsMatchAttendance(self):
+        stored = self.bitmaps()
+        AttendanceBitmap.objects.all().delete()
+        pack_attendance()
+        self.assertEqual(stored, self.bitmaps())
+        for student in self.students[:2]:
+            records = Attendance.objects.filter(student=student)
+            stats = get_attendance_stats(student)
+            self.assertEqual(stats['total_records'], records.count())
+            self.assertEqual(stats['present_count'], records.filter(status='Present').count())
+
+    def test_pack_attendance_matches_the_signals(self):
+        stored = self.bitmaps()
+        AttendanceBitmap.objects.all().delete()
+        self.assertEqual(pack_attendance(), (48, 16))
+        self.assertEqual(self.bitmaps(), stored)
+
+    def test_bitmaps_follow_save_update_and_delete(self):
+        student, course = self.students[0], self.courses[0]
+        record = Attendance.objects.create(
+            student=student, course=course, date=FIRST_DAY + datetime.timedelta(days=10), status='Absent',
+        )
+        self.assertBitmapsMatchAttendance()
+        record.status = 'Present'
+        record.save()
+        self.assertBitmapsMatchAttendance()
+
+        # Moving a record clears its old day
+        response = self.api(self.admin).patch(
+            f'/api/attendance/{record.id}/', {'date': '2025-12-30'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_attendance_stats(student, course)['total_records'], 4)
+        self.assertBitmapsMatchAttendance()
+        record.refresh_from_db()
+        record.student = self.students[1]
+        record.save()
+        self.assertBitmapsMatchAttendance()
+
+        record.delete()
+        self.assertBitmapsMatchAttendance()
+
+    def test_batches_over_a_thousand_students(self):
+        students = add_students(1200)
+        record_attendance([
+            Attendance(student=student, course=self.courses[0], date=FIRST_DAY, status='Present')
+            for student in students
+        ])
+        self.assertEqual(AttendanceBitmap.objects.filter(student__in=students).count(), 1200)
+        record_attendance([
+            Attendance(student=student, course=self.courses[0], date=FIRST_DAY, status='Present')
+            for student in students
+        ], deleted=True)
+        self.assertEqual(get_attendance_stats(students[-1])['total_records'], 0)
+
+
+class RollupAssertions:
+    ROLLUPS = (
+        (CourseDailyAttendance, 'course_id', 'date'),
+        (StudentMonthlyAttendance, 'student_id', 'month'),
+        (CourseMonthlyAttendance, 'course_id', 'month'),
+    )
+
+    def rollups(self):
+        # Rows counted down to zero are left in place; a rebuild doesn't write them
+        return {
+            model.__name__: {
+                (owner, day): (present, absent)
+                for owner, day, present, absent in model.objects.values_list(
+                    owner, period, 'present_count', 'absent_count',
+                )
+                if present or absent
+            }
+            for model, owner, period in self.ROLLUPS
+        }
+
+    def assertRollupsMatchAttendance(self):
+        stored = self.rollups()
+        rebuild_attendance_rollups()
+        self.assertEqual(stored, self.rollups())
+
+
+class AttendanceRollupTests(RollupAssertions, SchoolTestCase):
+
+    def test_rollups_follow_save_update_and_delete(self):
+        self.assertRollupsMatchAttendance()
+        record = Attendance.objects.create(
+            student=self.students[0], course=self.courses[0], date=datetime.date(2026, 2, 2), status='Absent',
+        )
+        self.assertRollupsMatchAttendance()
+        record.status = 'Present'
+        record.save()
+        self.assertRollupsMatchAttendance()
+
+        # Moving a record takes it out of its old day and month
+        moved = Attendance.objects.get(student=self.students[0], course=self.courses[0], date=FIRST_DAY)
+        response = self.api(self.admin).patch(
+            f'/api/attendance/{moved.id}/', {'date': '2026-03-02'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        daily = CourseDailyAttendance.objects.get(course=self.courses[0], date=FIRST_DAY)
+        self.assertEqual(daily.present_count + daily.absent_count, 7)
+        self.assertRollupsMatchAttendance()
+
+        record.delete()
+        self.assertRollupsMatchAttendance()
+
+    def test_bulk_write_over_a_thousand_students(self):
+        students = add_students(1200, [self.courses[0]])
+        day = FIRST_DAY + datetime.timedelta(days=14)
+        response = self.api(self.admin).post('/api/attendance/bulk/', [
+            {'student_id': student.id, 'course_id': self.courses[0].id, 'date': day.isoformat(),
+             'status': 'Present' if i % 4 else 'Absent'}
+            for i, student in enumerate(students)
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        daily = CourseDailyAttendance.objects.get(course=self.courses[0], date=day)
+        self.assertEqual((daily.present_count, daily.absent_count), (900, 300))
+        self.assertEqual(StudentMonthlyAttendance.objects.filter(student__in=students).count(), 1200)
+        self.assertEqual(get_attendance_stats(students[0])['absent_count'], 1)
+        self.assertRollupsMatchAttendance()
+
+    def trend(self, **params):
+        response = self.api(self.admin).get(f'/api/courses/{self.courses[0].id}/attendance-trend/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(row.get('date') or row['month'], row['present'], row['absent']) for row in response.json()['trend']]
+
+    def expected_trend(self, days):
+        records = Attendance.objects.filter(course=self.courses[0])
+        return [
+            (day.isoformat(), records.filter(date__range=(day, until), status='Present').count(),
+             records.filter(date__range=(day, until), status='Absent').count())
+            for day, until in days
+        ]
+
+    def test_attendance_trend(self):
+        Attendance.objects.create(
+            student=self.students[0], course=self.courses[0], date=datetime.date(2026, 2, 3), status='Present',
+        )
+        second, third = FIRST_DAY + datetime.timedelta(days=1), FIRST_DAY + datetime.timedelta(days=2)
+        self.assertEqual(
+            self.trend(date_from=second.isoformat(), date_to='2026-01-31'),
+            self.expected_trend([(second, second), (third, third)]),
+        )
+        january = (datetime.date(2026, 1, 1), datetime.date(2026, 1, 31))
+        february = (datetime.date(2026, 2, 1), datetime.date(2026, 2, 28))
+        self.assertEqual(self.trend(period='monthly'), self.expected_trend([january, february]))
+        # date_from counts from the start of its month
+        self.assertEqual(
+            self.trend(period='monthly', date_from='2026-01-20', date_to='2026-01-31'), self.expected_trend([january]),
+        )
+        self.assertEqual(self.trend(period='monthly', date_from='2026-02-10'), self.expected_trend([february]))
+
+
+class CascadeDeleteTests(RollupAssertions, SchoolTestCase):
+    """Deleting a student or course refreshes what its cascaded rows fed once, not per row"""
+
+    def test_deleting_a_course_runs_a_fixed_number_of_queries(self):
+        course = self.courses[0]
+        students = add_students(300, [course, self.courses[1]])
+        for c in self.courses:
+            Attendance.objects.bulk_create([
+                Attendance(student=student, course=c, date=FIRST_DAY + datetime.timedelta(days=day), status='Present')
+                for student in students for day in range(3)
+            ])
+            Grade.objects.bulk_create([Grade(student=student, course=c, marks=70, grade='B+', grade_point=3.2)
+                                       for student in students])
+        pack_attendance()
+        rebuild_attendance_rollups()
+        rebuild_student_summaries()
+        cache.set(course_rankings_cache_key(self.courses[1].id), [])
+
+        with CaptureQueriesContext(connection) as queries:
+            course.delete()
+        self.assertLess(len(queries), 60)
+
+        self.assertRollupsMatchAttendance()
+        self.assertEqual(StudentSummary.objects.get(student=students[0]).course_count, 1)
+        self.assertEqual(StudentSummary.objects.get(student=self.students[0]).gpa, calculate_student_gpa(self.students[0]))
+        self.assertEqual(get_attendance_stats(students[0])['total_records'], 3)
+        self.assertIsNotNone(cache.get(course_rankings_cache_key(self.courses[1].id)))
+
+    def test_deleting_a_student(self):
+        student = self.students[0]
+        keys = [class_rankings_cache_key(student.student_class), course_rankings_cache_key(self.courses[0].id)]
+        cache.set_many(dict.fromkeys(keys, []))
+        student.delete()
+        self.assertRollupsMatchAttendance()
+        daily = CourseDailyAttendance.objects.get(course=self.courses[0], date=FIRST_DAY)
+        self.assertEqual(daily.present_count + daily.absent_count, 7)
+        self.assertEqual(cache.get_many(keys), {})
+        response = self.api(self.admin).get(f'/api/courses/{self.courses[0].id}/rankings/')
+        self.assertEqual(len(response.json()['rankings']), 7)
+
+
+class BulkUpsertTests(SchoolTestCase):
+
+    def bulk(self, path, items):
+        return self.api(self.teacher.user).post(f'/api/{path}/bulk/', items, content_type='application/json')
+
+    def test_enrollments_are_created_or_left_unchanged(self):
+        course = Course.objects.create(name='Course 2', code='C2', description='', teacher=self.teacher)
+        existing = Enrollment.objects.get(student=self.students[0], course=self.courses[0])
+        response = self.bulk('enrollments', [
+            {'student_id': self.students[0].id, 'course_id': course.id},
+            {'student_id': self.students[0].id, 'course_id': self.courses[0].id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        created, unchanged = response.json()['results']
+        new = Enrollment.objects.get(student=self.students[0], course=course)
+        self.assertEqual((created['status'], created['id']), ('created', new.id))
+        self.assertEqual((unchanged['status'], unchanged['id']), ('unchanged', existing.id))
+        self.assertEqual(Enrollment.objects.filter(student=self.students[0]).count(), 3)
+
+    def test_grades_are_updated_or_created(self):
+        Grade.objects.filter(student=self.students[1], course=self.courses[1]).delete()
+        existing = Grade.objects.get(student=self.students[0], course=self.courses[0])
+        response = self.bulk('grades', [
+            {'student_id': self.students[0].id, 'course_id': self.courses[0].id, 'marks': 91},
+            {'student_id': self.students[1].id, 'course_id': self.courses[1].id, 'marks': 45},
+        ])
+        self.assertEqual(response.status_code, 200)
+        updated, created = response.json()['results']
+        self.assertEqual((updated['status'], updated['id']), ('updated', existing.id))
+        self.assertEqual(created['status'], 'created')
+        existing.refresh_from_db()
+        self.assertEqual((existing.marks, existing.grade), (91, 'A+'))
+        self.assertEqual(Grade.objects.get(id=created['id']).grade, 'C')
+
+    def test_attendance_is_created_then_updated(self):
+        day = FIRST_DAY + datetime.timedelta(days=7)
+        items = [{'student_id': student.id, 'course_id': self.courses[0].id, 'date': day.isoformat(), 'status': 'Present'}
+                 for student in self.students[:2]]
+        response = self.bulk('attendance', items)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['created', 'created'])
+        items[0]['status'] = 'Absent'
+        response = self.bulk('attendance', items)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['updated', 'updated'])
+        self.assertEqual(Attendance.objects.get(student=self.students[0], date=day).status, 'Absent')
+
+    def test_an_invalid_item_writes_nothing(self):
+        day = FIRST_DAY + datetime.timedelta(days=7)
+        response = self.bulk('attendance', [
+            {'student_id': self.students[0].id, 'course_id': self.courses[0].id, 'date': day.isoformat(), 'status': 'Present'},
+            {'student_id': self.students[1].id, 'course_id': self.courses[0].id, 'date': day.isoformat(), 'status': 'Late'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual(body['written'], 0)
+        self.assertEqual([result['status'] for result in body['results']], ['valid', 'error'])
+        self.assertFalse(Attendance.objects.filter(date=day).exists())
+
+
+class ExportTests(SchoolTestCase):
+
+    def export(self, user, name):
+        client = self.client_class()
+        client.force_login(user)
+        response = client.get(f'/exports/{name}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{name}"')
+        return b''.join(response.streaming_content).decode()
+
+    def csv_rows(self, user, name):
+        return list(csv.DictReader(io.StringIO(self.export(user, name))))
+
+    def jsonl_rows(self, user, name):
+        return [json.loads(line) for line in self.export(user, name).splitlines()]
+
+    def test_grades_csv_has_every_field_of_every_grade(self):
+        rows = self.csv_rows(self.admin, 'grades.csv')
+        expected = [
+            {
+                'id': str(grade.id), 'student_id': str(grade.student_id), 'roll_no': grade.student.roll_no,
+                'student_name': grade.student.name, 'course_code': grade.course.code, 'course_name': grade.course.name,
+                'marks': str(grade.marks), 'grade': grade.grade, 'grade_point': str(grade.grade_point),
+            }
+            for grade in Grade.objects.select_related('student', 'course').order_by('id')
+        ]
+        self.assertEqual(rows, expected)
+
+    def test_attendance_jsonl_has_every_field_of_every_record(self):
+        rows = self.jsonl_rows(self.admin, 'attendance.jsonl')
+        expected = [
+            {
+                'id': record.id, 'date': record.date.isoformat(), 'student_id': record.student_id,
+                'roll_no': record.student.roll_no, 'student_name': record.student.name,
+                'course_code': record.course.code, 'course_name': record.course.name, 'status': record.status,
+            }
+            for record in Attendance.objects.select_related('student', 'course').order_by('date', 'id')
+        ]
+        self.assertEqual(rows, expected)
+
+    def test_csv_and_jsonl_export_the_same_rows(self):
+        for name in ('grades', 'attendance'):
+            with self.subTest(name=name):
+                csv_ids = [int(row['id']) for row in self.csv_rows(self.admin, f'{name}.csv')]
+                jsonl_ids = [row['id'] for row in self.jsonl_rows(self.admin, f'{name}.jsonl')]
+                self.assertEqual(csv_ids, jsonl_ids)
+
+    def test_students_export_only_their_own_rows(self):
+        student = self.students[0]
+        for name, model in (('grades.jsonl', Grade), ('attendance.jsonl', Attendance)):
+            with self.subTest(name=name):
+                rows = self.jsonl_rows(student.user, name)
+                self.assertEqual({row['student_id'] for row in rows}, {student.id})
+                self.assertEqual(len(rows), model.objects.filter(student=student).count())
+
+    def test_teachers_export_only_their_courses(self):
+        course = Course.objects.create(name='Art', code='ART', description='', teacher=self.idle_teacher)
+        Enrollment.objects.create(student=self.students[0], course=course)
+        Grade.objects.create(student=self.students[0], course=course, marks=81)
+        Attendance.objects.create(student=self.students[0], course=course, date=FIRST_DAY, status='Present')
+        teaches = {self.teacher: {'C0', 'C1'}, self.idle_teacher: {'ART'}}
+        for teacher, codes in teaches.items():
+            for name in ('grades.csv', 'attendance.csv'):
+                with self.subTest(teacher=teacher.name, name=name):
+                    self.assertEqual({row['course_code'] for row in self.csv_rows(teacher.user, name)}, codes)
+
+    def test_anonymous_users_are_sent_to_log_in(self):
+        response = self.client.get('/exports/grades.csv')
+        self.assertRedirects(response, '/login/?next=/exports/grades.csv', fetch_redirect_response=False)
+
+
+class ResponseCacheTests(SchoolTestCase):
+
+    def cache_queries(self, request):
+        """(response, cache database queries) for `request`, leaving out the savepoints TestCase adds"""
+        with CaptureQueriesContext(connections['cache']) as queries:
+            response = request()
+        return response, [query['sql'] for query in queries.captured_queries if 'SAVEPOINT' not in query['sql']]
+
+    def write(self, method, path, data):
+        # Versions are bumped once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.api(self.teacher.user), method)(path, data, content_type='application/json')
+        self.assertIn(response.status_code, (200, 201))
+        return response
+
+    def test_a_write_bumps_the_data_version(self):
+        grade = Grade.objects.filter(course=self.courses[0]).first()
+        before = get_data_versions(['grade', 'attendance'])
+        self.write('patch', f'/api/grades/{grade.id}/', {'marks': 95})
+        after = get_data_versions(['grade', 'attendance'])
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+
+    def test_list_and_retrieve_are_fresh_after_a_write(self):
+        api = self.api(self.teacher.user)
+        grade = Grade.objects.filter(course=self.courses[0]).first()
+        detail = f'/api/grades/{grade.id}/'
+        self.assertEqual(api.get(detail).json()['marks'], grade.marks)
+        listed = {row['id']: row['marks'] for row in api.get('/api/grades/').json()['results']}
+        self.assertEqual(listed[grade.id], grade.marks)
+        # Served from the cache until something changes
+        _, queries = self.cache_queries(lambda: api.get(detail))
+        self.assertEqual(len(queries), 2)
+
+        self.write('patch', detail, {'marks': 95})
+        self.assertEqual(api.get(detail).json()['marks'], 95)
+        listed = {row['id']: row['marks'] for row in api.get('/api/grades/').json()['results']}
+        self.assertEqual(listed[grade.id], 95)
+
+    def test_a_created_row_shows_up_in_the_cached_list(self):
+        api = self.api(self.teacher.user)
+        day = FIRST_DAY + datetime.timedelta(days=10)
+        self.assertFalse([row for row in api.get('/api/attendance/').json()['results'] if row['date'] == day.isoformat()])
+        created = self.write('post', '/api/attendance/', {
+            'student_id': self.students[0].id, 'course_id': self.courses[0].id, 'date': day.isoformat(), 'status': 'Absent',
+        }).json()
+        listed = {row['id'] for row in api.get('/api/attendance/', {'page_size': 500}).json()['results']}
+        self.assertIn(created['id'], listed)
+
+    def test_cache_database_queries_match_the_settings(self):
+        """The per-request costs documented next to CACHES in sms/settings.py"""
+        api = self.api(self.admin)
+        # Cold: 1 version read, 5 versions added (3 each) and read back (1), response read (1) and stored (3)
+        _, cold = self.cache_queries(lambda: api.get('/api/grades/'))
+        self.assertEqual(len(cold), 1 + 5 * 3 + 1 + 1 + 3)
+        _, hit = self.cache_queries(lambda: api.get('/api/grades/'))
+        self.assertEqual(len(hit), 2)
+        _, miss = self.cache_queries(lambda: api.get('/api/grades/', {'page_size': 5}))
+        self.assertEqual(len(miss), 5)
+        _, bump = self.cache_queries(lambda: bump_data_version('grade', 'attendance'))
+        self.assertEqual(len(bump), 2 * 3)
+
+
+class DashboardCacheTests(SchoolTestCase):
+
+    def dashboard(self, user):
+        client = self.client_class()
+        client.force_login(user)
+        response = client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def changed(self, change):
+        # Data versions are bumped once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    def test_the_payload_is_cached_until_a_write(self):
+        student = self.students[0]
+        self.dashboard(student.user)
+        with mock.patch('core.utils.dashboard.student_dashboard') as computed:
+            self.dashboard(student.user)
+        computed.assert_not_called()
+        record = Attendance.objects.filter(student=student).first()
+        record.status = 'Absent' if record.status == 'Present' else 'Present'
+        self.changed(record.save)
+        with mock.patch('core.utils.dashboard.student_dashboard', return_value={}) as computed:
+            self.dashboard(student.user)
+        computed.assert_called_once_with(student.id)
+
+    def test_student_dashboard_follows_grades_attendance_and_enrollments(self):
+        student = self.students[0]
+        before = self.dashboard(student.user)
+        course = Course.objects.create(name='Art', code='ART', description='', teacher=self.teacher)
+
+        self.changed(lambda: Enrollment.objects.create(student=student, course=course))
+        self.assertEqual(self.dashboard(student.user)['enrolled_count'], before['enrolled_count'] + 1)
+
+        self.changed(lambda: Grade.objects.create(student=student, course=course, marks=95))
+        after = self.dashboard(student.user)
+        self.assertEqual(after['total_grades'], before['total_grades'] + 1)
+        self.assertEqual(after['recent_grades'][0], {'course': {'name': 'Art'}, 'grade': 'A+', 'marks': 95})
+        self.assertEqual(after['gpa'], StudentSummary.objects.get(student=student).gpa)
+        self.assertGreater(after['gpa'], before['gpa'])
+
+        def attend_everything():
+            absences = Attendance.objects.filter(student=student, status='Absent')
+            self.assertTrue(absences.exists())
+            for record in absences:
+                record.status = 'Present'
+                record.save()
+
+        self.changed(attend_everything)
+        self.assertEqual(self.dashboard(student.user)['attendance_percentage'], 100)
+
+    def test_teacher_dashboard_follows_enrollments_and_grades(self):
+        before = self.dashboard(self.teacher.user)
+        newcomer = add_students(1)[0]
+        self.changed(lambda: Enrollment.objects.create(student=newcomer, course=self.courses[0]))
+        after = self.dashboard(self.teacher.user)
+        self.assertEqual(after['total_students'], before['total_students'] + 1)
+        self.changed(lambda: Grade.objects.create(student=newcomer, course=self.courses[0], marks=70))
+        self.assertEqual(self.dashboard(self.teacher.user)['grades_entered'], before['grades_entered'] + 1)
+
+    def test_admin_dashboard_follows_new_students_and_teachers(self):
+        before = self.dashboard(self.admin)
+        self.changed(lambda: Student.objects.create(
+            user=User.objects.create_user('newcomer'), name='Newcomer', email='new@school.test', roll_no='N01',
+            student_class='10A', date_of_birth=datetime.date(2010, 1, 1), gender='Male',
+        ))
+        self.changed(lambda: Teacher.objects.create(
+            user=User.objects.create_user('new-teacher'), name='New Teacher', subject='Music',
+            email='music@school.test', phone='98000009',
+        ))
+        after = self.dashboard(self.admin)
+        self.assertEqual(after['total_students'], before['total_students'] + 1)
+        self.assertEqual(after['total_teachers'], before['total_teachers'] + 1)
+
+    def test_payloads_are_per_user(self):
+        first, second = self.students[0], self.students[1]
+        self.assertEqual(self.dashboard(first.user)['gpa'], StudentSummary.objects.get(student=first).gpa)
+        self.assertEqual(self.dashboard(second.user)['gpa'], StudentSummary.objects.get(student=second).gpa)
+        self.assertNotEqual(
+            self.dashboard(first.user)['recent_grades'], self.dashboard(second.user)['recent_grades'],
+        )
+
+
+class RosterCacheTests(SchoolTestCase):
+
+    def roster_ids(self, course):
+        return [row['student']['id'] for row in get_course_roster(course.id)]
+
+    def test_rosters_are_cached(self):
+        expected = self.roster_ids(self.courses[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.roster_ids(self.courses[0]), expected)
+
+    def test_enrolling_and_unenrolling_refresh_the_roster(self):
+        course = self.courses[0]
+        newcomer = add_students(1)[0]
+        self.assertNotIn(newcomer.id, self.roster_ids(course))
+        enrollment = Enrollment.objects.create(student=newcomer, course=course)
+        self.assertIn(newcomer.id, self.roster_ids(course))
+        enrollment.delete()
+        self.assertNotIn(newcomer.id, self.roster_ids(course))
+
+    def test_moving_an_enrollment_refreshes_both_rosters(self):
+        newcomer = add_students(1, [self.courses[0]])[0]
+        self.assertIn(newcomer.id, self.roster_ids(self.courses[0]))
+        self.assertNotIn(newcomer.id, self.roster_ids(self.courses[1]))
+        enrollment = Enrollment.objects.get(student=newcomer)
+        response = self.api(self.admin).patch(
+            f'/api/enrollments/{enrollment.id}/', {'course_id': self.courses[1].id}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(newcomer.id, self.roster_ids(self.courses[0]))
+        self.assertIn(newcomer.id, self.roster_ids(self.courses[1]))
+
+    def test_bulk_enrollments_refresh_the_roster(self):
+        course = self.courses[1]
+        newcomers = add_students(3)
+        self.roster_ids(course)
+        response = self.api(self.teacher.user).post('/api/enrollments/bulk/', [
+            {'student_id': student.id, 'course_id': course.id} for student in newcomers
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue({student.id for student in newcomers} <= set(self.roster_ids(course)))
+
+    def test_editing_a_student_refreshes_their_rosters(self):
+        student = self.students[0]
+        for course in self.courses:
+            self.roster_ids(course)
+        student.name, student.student_class = 'Renamed', '12C'
+        student.save()
+        for course in self.courses:
+            with self.subTest(course=course.code):
+                row = next(row for row in get_course_roster(course.id) if row['student']['id'] == student.id)
+                self.assertEqual((row['student']['name'], row['student']['student_class']), ('Renamed', '12C'))
+
+    def test_deleting_a_student_refreshes_their_rosters(self):
+        for student, delete in (
+            (self.students[0], lambda student: student.delete()),
+            (self.students[1], lambda student: self.api(self.admin).delete(f'/api/students/{student.id}/')),
+        ):
+            for course in self.courses:
+                self.assertIn(student.id, self.roster_ids(course))
+            delete(student)
+            for course in self.courses:
+                with self.subTest(student=student.name, course=course.code):
+                    self.assertNotIn(student.id, self.roster_ids(course))
+
+    def test_the_course_page_shows_the_fresh_roster(self):
+        client = self.client_class()
+        client.force_login(self.admin)
+        client.get(f'/courses/{self.courses[0].id}/')
+        student = self.students[0]
+        student.name = 'Renamed Student'
+        student.save()
+        self.assertContains(client.get(f'/courses/{self.courses[0].id}/'), 'Renamed Student')
+
+
+@override_settings(QUERY_BUDGET_CHECK=True, QUERY_BUDGET_ACTION='raise')
+class QueryBudgetTests(TestCase):
+    """
+    Requests every view and API action as the roles that use it, against a
+    school big enough that per-row queries show up. QueryBudgetMiddleware
+    raises when a request runs more queries than its view's budget.
+    """
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password=PASSWORD)
+
+        cls.teachers, cls.courses = [], []
+        for t in range(TEACHERS):
+            user = User.objects.create_user(f'teacher{t}', password=PASSWORD)
+            teacher = Teacher.objects.create(
+                user=user, name=f'Teacher {t}', subject=f'Subject {t}', email=f'teacher{t}@school.test', phone='98000000'
+            )
+            cls.teachers.append(teacher)
+            for c in range(COURSES_PER_TEACHER):
+                cls.courses.append(Course.objects.create(
+                    name=f'Course {t}{c}', code=f'C{t}{c}', description='Budget fixture course', teacher=teacher
+                ))
+
+        students = []
+        for s in range(STUDENTS):
+            user = User.objects.create_user(f'student{s}', password=PASSWORD)
+            students.append(Student(
+                user=user, name=f'Student {s:03d}', email=f'student{s}@school.test', roll_no=f'R{s:03d}',
+                student_class=f'10{"ABC"[s % 3]}', date_of_birth=datetime.date(2010, 1, 1),
+                gender='Male' if s % 2 else 'Female',
+            ))
+        # Saved one by one so the search index and signals see them
+        for student in students:
+            student.save()
+        cls.students = students
+
+        for s, student in enumerate(students):
+            for c in range(COURSES_PER_STUDENT):
+                course = cls.courses[(s + c) % len(cls.courses)]
+                Enrollment.objects.create(student=student, course=course)
+                Grade.objects.create(student=student, course=course, marks=40 + (s * 7 + c * 11) % 60)
+                for day in range(ATTENDANCE_DAYS):
+                    Attendance.objects.create(
+                        student=student, course=course, date=FIRST_DAY + datetime.timedelta(days=day),
+                        status='Absent' if (s + day) % 4 == 0 else 'Present',
+                    )
+
+        cls.teacher = cls.teachers[0]
+        cls.course = cls.courses[0]
+        cls.student = Enrollment.objects.filter(course=cls.course).order_by('id').first().student
+        cls.grade = Grade.objects.filter(student=cls.student).first()
+        cls.attendance = Attendance.objects.filter(student=cls.student).first()
+        cls.enrollment = Enrollment.objects.filter(student=cls.student).first()
+        # Enrolled in the course but not graded yet, for the single grade form
+        cls.ungraded = Student.objects.exclude(enrollment__course=cls.course).first()
+        Enrollment.objects.create(student=cls.ungraded, course=cls.course)
+
+    def setUp(self):
+        # Budgets are for the uncached path
+        cache.clear()
+
+    def client_for(self, user):
+        client = self.client_class()
+        if user is not None:
+            client.force_login(user)
+        return client
+
+    def api_client_for(self, user):
+        token = RoleTokenObtainPairSerializer.get_token(user).access_token
+        return self.client_class(headers={'Authorization': f'Bearer {token}'})
+
+    def page_requests(self):
+        """(url name, user, method, path, data, expected status) for the template and AJAX views"""
+        admin, teacher, student = self.admin, self.teacher.user, self.student.user
+        course = self.course
+        enrolled = list(Enrollment.objects.filter(course=course).values_list('student_id', flat=True))
+        day = FIRST_DAY.isoformat()
+        return [
+            ('login', None, 'get', '/login/', None, 200),
+            ('login', None, 'post', '/login/', {'username': 'teacher0', 'password': PASSWORD}, 302),
+            ('logout', teacher, 'get', '/logout/', None, 302),
+            ('dashboard', admin, 'get', '/dashboard/', None, 200),
+            ('dashboard', teacher, 'get', '/dashboard/', None, 200),
+            ('dashboard', student, 'get', '/dashboard/', None, 200),
+            ('profile', teacher, 'get', '/profile/', None, 200),
+            ('profile', student, 'get', '/profile/', None, 200),
+            ('student_list', admin, 'get', '/students/', None, 200),
+            ('student_list', teacher, 'get', '/students/?q=Student&class=10A&gender=Male', None, 200),
+            ('student_list_fragment', admin, 'get', '/students/page/?page=2', None, 200),
+            ('teacher_list', admin, 'get', '/teachers/', None, 200),
+            ('course_list', admin, 'get', '/courses/', None, 200),
+            ('course_list', teacher, 'get', '/courses/', None, 200),
+            ('course_list', student, 'get', '/courses/', None, 200),
+            ('course_detail', admin, 'get', f'/courses/{course.id}/', None, 200),
+            ('course_detail', student, 'get', f'/courses/{course.id}/', None, 200),
+            ('teacher_students', teacher, 'get', '/my-students/', None, 200),
+            ('teacher_students', teacher, 'get', f'/my-students/?course={course.id}', None, 200),
+            ('teacher_students_fragment', teacher, 'get', '/my-students/page/?page=2', None, 200),
+            ('search', admin, 'get', '/search/?q=Stud', None, 200),
+            ('search', student, 'get', '/search/?q=Course', None, 200),
+            ('my_attendance', student, 'get', '/my-attendance/', None, 200),
+            ('my_grades', student, 'get', '/my-grades/', None, 200),
+            ('attendance_mark', teacher, 'get', '/attendance/mark/', None, 200),
+            ('attendance_entry', admin, 'get', '/attendance/entry/', None, 200),
+            ('attendance_entry', teacher, 'get', '/attendance/entry/', None, 200),
+            ('attendance_entry', teacher, 'post', '/attendance/entry/', {
+                'single_attendance': '1', 'student': self.student.id, 'course': course.id,
+                'date': '2026-02-02', 'status': 'Present',
+            }, 302),
+            ('attendance_entry', teacher, 'post', '/attendance/entry/', {
+                'bulk_attendance': '1', 'course': course.id, 'date': '2026-02-03',
+            }, 302),
+            ('bulk_attendance_entry', teacher, 'get', f'/attendance/bulk/{course.id}/{day}/', None, 200),
+            ('bulk_attendance_entry', teacher, 'post', f'/attendance/bulk/{course.id}/2026-02-04/', {
+                f'status_{student_id}': 'Present' if i % 3 else 'Absent' for i, student_id in enumerate(enrolled)
+            }, 302),
+            ('grade_entry', admin, 'get', '/grades/entry/', None, 200),
+            ('grade_entry', teacher, 'get', '/grades/entry/', None, 200),
+            ('grade_entry', teacher, 'post', '/grades/entry/', {
+                'single_grade': '1', 'student': self.ungraded.id, 'course': course.id, 'marks': '77', 'grade': 'B+',
+            }, 302),
+            ('grade_entry', teacher, 'post', '/grades/entry/', {'bulk_grade': '1', 'course': course.id}, 302),
+            ('bulk_grade_entry', teacher, 'get', f'/grades/bulk/{course.id}/', None, 200),
+            ('bulk_grade_entry', teacher, 'post', f'/grades/bulk/{course.id}/', {
+                f'marks_{student_id}': str(50 + i) for i, student_id in enumerate(enrolled)
+            }, 302),
+            ('export_attendance_csv', admin, 'get', '/exports/attendance.csv', None, 200),
+            ('export_attendance_jsonl', teacher, 'get', '/exports/attendance.jsonl', None, 200),
+            ('export_grades_csv', teacher, 'get', '/exports/grades.csv', None, 200),
+            ('export_grades_jsonl', student, 'get', '/exports/grades.jsonl', None, 200),
+            ('get_course_students', teacher, 'get', f'/get-course-students/{course.id}/', None, 200),
+            ('calculate_grade_ajax', teacher, 'post', '/calculate-grade/', {'marks': '82'}, 200),
+            ('calculate_grade_ajax', teacher, 'post', '/calculate-grade/', {'marks': ['82', '45', '91']}, 200),
+        ]
+
+    def api_requests(self):
+        """(url name, user, method, path, data, expected status) for the JSON API, authenticated by JWT"""
+        admin, teacher, student = self.admin, self.teacher.user, self.student.user
+        course, other_course = self.course, self.courses[1]
+        unenrolled = Student.objects.exclude(enrollment__course=other_course).first()
+        # Deleted last, with everything that cascades from them
+        doomed_student, doomed_teacher, doomed_course = self.students[-1], self.teachers[-1], self.courses[-1]
+        doomed_enrollment = Enrollment.objects.filter(student=self.students[-2]).first()
+        doomed_attendance = Attendance.objects.filter(student=self.student, course=course).last()
+        doomed_grade = Grade.objects.filter(student=self.students[-2]).first()
+        student_data = {
+            'name': self.student.name, 'email': self.student.email, 'roll_no': self.student.roll_no,
+            'student_class': '10C', 'date_of_birth': '2010-02-01', 'gender': self.student.gender,
+        }
+        return [
+            ('api-root', admin, 'get', '/api/', None, 200),
+            ('search_api', teacher, 'get', '/api/search/?q=R0', None, 200),
+            ('student-list', admin, 'get', '/api/students/', None, 200),
+            ('student-list', teacher, 'get', '/api/students/?expand=user', None, 200),
+            ('student-detail', student, 'get', f'/api/students/{self.student.id}/', None, 200),
+            ('student-detail', admin, 'put', f'/api/students/{self.student.id}/', student_data, 200),
+            ('student-detail', admin, 'patch', f'/api/students/{self.student.id}/', {'student_class': '10B'}, 200),
+            ('student-rankings', teacher, 'get', '/api/students/rankings/?class=10A', None, 200),
+            ('teacher-list', admin, 'get', '/api/teachers/', None, 200),
+            ('teacher-detail', admin, 'get', f'/api/teachers/{self.teacher.id}/', None, 200),
+            ('teacher-detail', admin, 'put', f'/api/teachers/{self.teacher.id}/', {
+                'name': 'Teacher Zero', 'subject': 'Physics', 'email': 'teacher0@school.test', 'phone': '98000001',
+            }, 200),
+            ('teacher-detail', admin, 'patch', f'/api/teachers/{self.teacher.id}/', {'phone': '98000002'}, 200),
+            ('course-list', student, 'get', '/api/courses/?expand=teacher', None, 200),
+            ('course-list', teacher, 'post', '/api/courses/', {
+                'name': 'New Course', 'code': 'N01', 'description': 'Created over the API', 'teacher_id': self.teacher.id,
+            }, 201),
+            ('course-detail', teacher, 'get', f'/api/courses/{course.id}/', None, 200),
+            ('course-detail', teacher, 'put', f'/api/courses/{course.id}/', {
+                'name': 'Course 00', 'code': course.code, 'description': 'Renamed', 'teacher_id': self.teacher.id,
+            }, 200),
+            ('course-detail', teacher, 'patch', f'/api/courses/{course.id}/', {'description': 'Patched'}, 200),
+            ('course-students', teacher, 'get', f'/api/courses/{course.id}/students/', None, 200),
+            ('course-attendance-trend', teacher, 'get', f'/api/courses/{course.id}/attendance-trend/', None, 200),
+            ('course-attendance-trend', teacher, 'get', f'/api/courses/{course.id}/attendance-trend/?period=monthly', None, 200),
+            ('course-rankings', teacher, 'get', f'/api/courses/{course.id}/rankings/', None, 200),
+            ('enrollment-list', admin, 'get', '/api/enrollments/?expand=student,course.teacher', None, 200),
+            ('enrollment-list', admin, 'post', '/api/enrollments/', {
+                'student_id': unenrolled.id, 'course_id': other_course.id,
+            }, 201),
+            ('enrollment-detail', teacher, 'get', f'/api/enrollments/{self.enrollment.id}/', None, 200),
+            ('enrollment-detail', admin, 'put', f'/api/enrollments/{self.enrollment.id}/', {
+                'student_id': self.enrollment.student_id, 'course_id': self.enrollment.course_id,
+            }, 200),
+            ('enrollment-detail', admin, 'patch', f'/api/enrollments/{self.enrollment.id}/', {
+                'course_id': self.enrollment.course_id,
+            }, 200),
+            ('enrollment-bulk', admin, 'post', '/api/enrollments/bulk/', [
+                {'student_id': unenrolled.id, 'course_id': other_course.id},
+                {'student_id': self.student.id, 'course_id': course.id},
+            ], 200),
+            ('attendance-list', teacher, 'get', '/api/attendance/', None, 200),
+            ('attendance-list', student, 'get', '/api/attendance/?expand=course', None, 200),
+            ('attendance-list', teacher, 'post', '/api/attendance/', {
+                'student_id': self.student.id, 'course_id': course.id, 'date': '2026-03-02', 'status': 'Present',
+            }, 201),
+            ('attendance-detail', student, 'get', f'/api/attendance/{self.attendance.id}/', None, 200),
+            ('attendance-detail', teacher, 'put', f'/api/attendance/{self.attendance.id}/', {
+                'student_id': self.student.id, 'course_id': self.attendance.course_id,
+                'date': self.attendance.date.isoformat(), 'status': 'Absent',
+            }, 200),
+            ('attendance-detail', teacher, 'patch', f'/api/attendance/{self.attendance.id}/', {'status': 'Present'}, 200),
+            ('attendance-detail', teacher, 'patch', f'/api/attendance/{self.attendance.id}/', {'date': '2026-03-09'}, 200),
+            ('attendance-bulk', teacher, 'post', '/api/attendance/bulk/', [
+                {'student_id': student_id, 'course_id': course.id, 'date': '2026-03-03', 'status': 'Present'}
+                for student_id in Enrollment.objects.filter(course=course).values_list('student_id', flat=True)
+            ], 200),
+            ('grade-list', teacher, 'get', '/api/grades/?expand=student,course', None, 200),
+            ('grade-list', student, 'get', '/api/grades/', None, 200),
+            ('grade-list', teacher, 'post', '/api/grades/', {
+                'student_id': self.ungraded.id, 'course_id': course.id, 'marks': 64,
+            }, 201),
+            ('grade-detail', student, 'get', f'/api/grades/{self.grade.id}/', None, 200),
+            ('grade-detail', teacher, 'put', f'/api/grades/{self.grade.id}/', {
+                'student_id': self.student.id, 'course_id': self.grade.course_id, 'marks': 91,
+            }, 200),
+            ('grade-detail', teacher, 'patch', f'/api/grades/{self.grade.id}/', {'marks': 88}, 200),
+            ('grade-bulk', teacher, 'post', '/api/grades/bulk/', [
+                {'student_id': student_id, 'course_id': course.id, 'marks': 70}
+                for student_id in Enrollment.objects.filter(course=course).values_list('student_id', flat=True)
+            ], 200),
+            ('grade-distribution', teacher, 'get', '/api/grades/distribution/?by=course', None, 200),
+            ('attendance-detail', teacher, 'delete', f'/api/attendance/{doomed_attendance.id}/', None, 204),
+            ('grade-detail', admin, 'delete', f'/api/grades/{doomed_grade.id}/', None, 204),
+            ('enrollment-detail', admin, 'delete', f'/api/enrollments/{doomed_enrollment.id}/', None, 204),
+            ('student-detail', admin, 'delete', f'/api/students/{doomed_student.id}/', None, 204),
+            ('course-detail', admin, 'delete', f'/api/courses/{doomed_course.id}/', None, 204),
+            ('teacher-detail', admin, 'delete', f'/api/teachers/{doomed_teacher.id}/', None, 204),
+        ]
+
+    def send(self, client, method, path, data, json=False):
+        if data is None:
+            return getattr(client, method)(path)
+        if json:
+            return getattr(client, method)(path, data, content_type='application/json')
+        return getattr(client, method)(path, data)
+
+    def check(self, requests, make_client, json=False):
+        for name, user, method, path, data, expected in requests:
+            with self.subTest(name=name, user=getattr(user, 'username', None), method=method, path=path):
+                response = self.send(make_client(user), method, path, data, json)
+                self.assertEqual(response.status_code, expected)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+
+    def test_every_url_is_covered(self):
+        covered = {name for name, *_ in self.page_requests() + self.api_requests()}
+        self.assertEqual(core_url_names() - covered, set())
+
+    def test_every_api_action_is_covered(self):
+        covered = {(name, method) for name, _, method, *_ in self.api_requests()}
+        # The serializers take no user, so students and teachers are not created over the API
+        uncreatable = {('student-list', 'post'), ('teacher-list', 'post')}
+        self.assertEqual(core_api_actions() - uncreatable - covered, set())
+
+    def test_pages_stay_within_budget(self):
+        self.check(self.page_requests(), self.client_for)
+
+    def test_api_stays_within_budget(self):
+        self.check(self.api_requests(), self.api_client_for, json=True)
+
+    def test_bulk_budgets_do_not_depend_on_batch_size(self):
+        max_items = views.AttendanceViewSet.bulk_max_items
+        other_course = self.courses[1]
+        students = add_students(max_items + 2, [self.course])
+        items = {
+            'enrollments': lambda student: {'student_id': student.id, 'course_id': other_course.id},
+            'attendance': lambda student: {
+                'student_id': student.id, 'course_id': self.course.id, 'date': '2026-03-03', 'status': 'Present',
+            },
+            'grades': lambda student: {'student_id': student.id, 'course_id': self.course.id, 'marks': 70},
+        }
+        client = self.api_client_for(self.teacher.user)
+        for path, item in items.items():
+            with self.subTest(path=path):
+                counts = []
+                for batch in (students[:2], students[2:]):
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.send(client, 'post', f'/api/{path}/bulk/', [item(s) for s in batch], json=True)
+                    self.assertEqual(response.status_code, 200)
+                    counts.append(len(queries))
+                self.assertEqual(counts[0], counts[1])
+
+    def test_destroy_budgets_do_not_depend_on_cascaded_rows(self):
+        client = self.api_client_for(self.admin)
+        counts = []
+        for students in (2, 600):
+            course = Course.objects.create(name=f'Doomed {students}', code=f'D{students}', teacher=self.teacher)
+            days = [FIRST_DAY + datetime.timedelta(days=day) for day in range(ATTENDANCE_DAYS)]
+            attendance, grades = [], []
+            for student in add_students(students, [course]):
+                grades.append(Grade(student=student, course=course, marks=60, grade='B', grade_point=2.8))
+                attendance += [Attendance(student=student, course=course, date=day, status='Present') for day in days]
+            Grade.objects.bulk_create(grades)
+            Attendance.objects.bulk_create(attendance)
+            record_attendance(attendance)
+            rebuild_attendance_rollups()
+            rebuild_student_summaries()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.delete(f'/api/courses/{course.id}/')
+            self.assertEqual(response.status_code, 204)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(Attendance.objects.filter(course__code__startswith='D').exists())
+
+    def test_overrun_raises(self):
+        with mock.patch.object(views.teacher_list_view, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client_for(self.admin).get('/teachers/')
+
+    @override_settings(QUERY_BUDGET_ACTION='log')
+    def test_overrun_logs_outside_tests(self):
+        with mock.patch.object(views.teacher_list_view, 'query_budget', 1):
+            with self.assertLogs('core.middleware', 'WARNING') as logs:
+                response = self.client_for(self.admin).get('/teachers/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('over its budget of 1', logs.output[0])
@@ -19,10 +19,13 @@ urlpatterns = [
     
     # Management views
     path('students/', views.student_list_view, name='student_list'),
+    path('students/page/', views.student_list_view, {'fragment': True}, name='student_list_fragment'),
     path('teachers/', views.teacher_list_view, name='teacher_list'),
     path('courses/', views.course_list_view, name='course_list'),
     path('courses/<int:course_id>/', views.course_detail_view, name='course_detail'),
     path('my-students/', views.teacher_students_view, name='teacher_students'),
+    path('my-students/page/', views.teacher_students_view, {'fragment': True}, name='teacher_students_fragment'),
+    path('search/', views.search_view, name='search'),
     
     # Student views
     path('my-attendance/', views.my_attendance_view, name='my_attendance'),
@@ -31,13 +34,21 @@ urlpatterns = [
     # Teacher views
     path('attendance/mark/', views.attendance_mark_view, name='attendance_mark'),
     path('attendance/entry/', views.attendance_entry_view, name='attendance_entry'),
+    path('attendance/bulk/<int:course_id>/<str:date>/', views.bulk_attendance_entry_view, name='bulk_attendance_entry'),
     path('grades/entry/', views.grade_entry_view, name='grade_entry'),
     path('grades/bulk/<int:course_id>/', views.bulk_grade_entry_view, name='bulk_grade_entry'),
     
+    # Exports
+    path('exports/attendance.csv', views.export_attendance, {'export_format': 'csv'}, name='export_attendance_csv'),
+    path('exports/attendance.jsonl', views.export_attendance, {'export_format': 'jsonl'}, name='export_attendance_jsonl'),
+    path('exports/grades.csv', views.export_grades, {'export_format': 'csv'}, name='export_grades_csv'),
+    path('exports/grades.jsonl', views.export_grades, {'export_format': 'jsonl'}, name='export_grades_jsonl'),
+    
     # AJAX endpoints
     path('get-course-students/<int:course_id>/', views.get_course_students, name='get_course_students'),
     path('calculate-grade/', views.calculate_grade_ajax, name='calculate_grade_ajax'),
     
     # API endpoints
+    path('api/search/', views.search_api, name='search_api'),
     path('api/', include(router.urls)),
 ]
@@ -0,0 +1,372 @@
+# Compact attendance bitmap utilities
+#
+# An AttendanceBitmap row packs one student's attendance in one course for a
+# whole term. Bit i of `recorded_days` is set when attendance was taken on
+# term_start + i days, and the same bit of `present_days` is set when the
+# student was present. Bitsets are stored little-endian as raw bytes.
+import datetime
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+
+
+def term_start_for(day):
+    """Terms follow the calendar year; returns the first day of day's term"""
+    return datetime.date(day.year, 1, 1)
+
+
+def encode_days(days, term_start):
+    """Pack an iterable of dates inside one term into a bitset (bytes)"""
+    bits = 0
+    for day in days:
+        bits |= 1 << (day - term_start).days
+    return int_to_bits(bits)
+
+
+def decode_days(bits, term_start):
+    """Unpack a bitset (bytes) into the sorted list of dates it contains"""
+    value = bits_to_int(bits)
+    days = []
+    offset = 0
+    while value:
+        if value & 1:
+            days.append(term_start + datetime.timedelta(days=offset))
+        value >>= 1
+        offset += 1
+    return days
+
+
+def bits_to_int(bits):
+    return int.from_bytes(bytes(bits or b''), 'little')
+
+
+def int_to_bits(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def popcount(bits):
+    """Number of days set in a bitset"""
+    return bits_to_int(bits).bit_count()
+
+
+def attendance_percentage(present, total, digits=1):
+    return round((present / total * 100) if total > 0 else 0, digits)
+
+
+def get_attendance_stats(student, course=None):
+    """
+    Present/absent/total counts and percentage for a student, optionally in
+    one course, computed by popcount over the student's packed bitmaps
+    (one row per course and term) instead of scanning daily records.
+    """
+    from core.models import AttendanceBitmap
+
+    bitmaps = AttendanceBitmap.objects.filter(student=student)
+    if course is not None:
+        bitmaps = bitmaps.filter(course=course)
+
+    total = present = 0
+    for recorded_days, present_days in bitmaps.values_list('recorded_days', 'present_days'):
+        total += popcount(recorded_days)
+        present += popcount(present_days)
+
+    return {
+        'present_count': present,
+        'absent_count': total - present,
+        'total_records': total,
+        'attendance_percentage': attendance_percentage(present, total),
+    }
+
+
+# Most distinct leading values one key lookup puts in an `__in` list: a
+# full bulk API request (BulkUpsertMixin.bulk_max_items) in one read, and
+# well inside SQLite's 32766-variable limit
+KEY_CHUNK_SIZE = 10000
+
+
+def key_chunks(keys, size=KEY_CHUNK_SIZE):
+    """
+    Split (a, b, ...) tuples into chunks of at most `size` distinct leading
+    values and yield, per chunk, the set of values in each position.
+    Filtering every column with `__in` on its set finds a superset of the
+    chunk's keys, which callers narrow by matching whole keys in Python.
+    Unlike OR-ing one Q per key, the SQL stays the same size however many
+    keys there are.
+    """
+    by_first = defaultdict(list)
+    for key in keys:
+        by_first[key[0]].append(key)
+    firsts = sorted(by_first)
+    for start in range(0, len(firsts), size):
+        chunk = [key for first in firsts[start:start + size] for key in by_first[first]]
+        yield [set(column) for column in zip(*chunk)]
+
+
+def _save_bitmaps(changes):
+    """
+    Apply {(student_id, course_id, term_start): {offset: status or None}}
+    to the stored bitmaps with one read per chunk of KEY_CHUNK_SIZE
+    students plus one update and one upsert statement. A status of None
+    clears the day (the record was deleted or moved).
+    """
+    from django.db import transaction
+    from core.models import AttendanceBitmap
+
+    if not changes:
+        return
+
+    with transaction.atomic():
+        existing = {}
+        for student_ids, course_ids, term_starts in key_chunks(changes):
+            bitmaps = AttendanceBitmap.objects.select_for_update().filter(
+                student_id__in=student_ids, course_id__in=course_ids, term_start__in=term_starts,
+            )
+            for bitmap in bitmaps:
+                key = (bitmap.student_id, bitmap.course_id, bitmap.term_start)
+                if key in changes:
+                    existing[key] = bitmap
+
+        new_bitmaps = []
+        for key, days in changes.items():
+            bitmap = existing.get(key)
+            if bitmap is None:
+                if all(status is None for status in days.values()):
+                    # Nothing to clear, and the student may be being deleted
+                    continue
+                bitmap = AttendanceBitmap(student_id=key[0], course_id=key[1], term_start=key[2])
+                new_bitmaps.append(bitmap)
+            recorded = bits_to_int(bitmap.recorded_days)
+            present = bits_to_int(bitmap.present_days)
+            for offset, status in days.items():
+                mask = 1 << offset
+                if status is None:
+                    recorded &= ~mask
+                else:
+                    recorded |= mask
+                if status == 'Present':
+                    present |= mask
+                else:
+                    present &= ~mask
+            bitmap.recorded_days = int_to_bits(recorded)
+            bitmap.present_days = int_to_bits(present)
+
+        if existing:
+            AttendanceBitmap.objects.bulk_update(existing.values(), ['recorded_days', 'present_days'])
+        AttendanceBitmap.objects.bulk_create(
+            new_bitmaps,
+            update_conflicts=True,
+            unique_fields=['student', 'course', 'term_start'],
+            update_fields=['recorded_days', 'present_days'],
+        )
+
+
+def record_attendance(records, deleted=False, moved_from=()):
+    """
+    Mirror saved (or deleted) Attendance rows into their bitmaps. Accepts any
+    iterable of Attendance instances; the bulk roster path passes the whole
+    roster at once. `moved_from` holds the previous (student, course, date)
+    of records whose key was changed by an update, which are cleared.
+    """
+    changes = defaultdict(dict)
+    for record in moved_from:
+        term_start = term_start_for(record.date)
+        changes[(record.student_id, record.course_id, term_start)][(record.date - term_start).days] = None
+    for record in records:
+        term_start = term_start_for(record.date)
+        key = (record.student_id, record.course_id, term_start)
+        changes[key][(record.date - term_start).days] = None if deleted else record.status
+    _save_bitmaps(changes)
+
+
+def pack_attendance(records=None, batch_size=5000, apps=global_apps):
+    """
+    Rebuild bitmaps from daily Attendance rows, streaming them from the
+    database. `records` must cover whole (student, course, term) groups since
+    each bitmap is rewritten from scratch; with no `records` every bitmap is
+    rebuilt. Migrations pass their own `apps` registry to use the historical
+    models. Returns (rows read, bitmaps written).
+    """
+    from django.db import transaction
+
+    Attendance = apps.get_model('core', 'Attendance')
+    AttendanceBitmap = apps.get_model('core', 'AttendanceBitmap')
+    full_rebuild = records is None
+    if full_rebuild:
+        records = Attendance.objects.all()
+
+    recorded = defaultdict(int)
+    present = defaultdict(int)
+    row_count = 0
+    rows = records.order_by().values_list('student_id', 'course_id', 'date', 'status')
+    for student_id, course_id, day, status in rows.iterator(chunk_size=batch_size):
+        term_start = term_start_for(day)
+        key = (student_id, course_id, term_start)
+        mask = 1 << (day - term_start).days
+        recorded[key] |= mask
+        if status == 'Present':
+            present[key] |= mask
+        row_count += 1
+
+    bitmaps = [
+        AttendanceBitmap(
+            student_id=student_id,
+            course_id=course_id,
+            term_start=term_start,
+            recorded_days=int_to_bits(bits),
+            present_days=int_to_bits(present[(student_id, course_id, term_start)]),
+        )
+        for (student_id, course_id, term_start), bits in recorded.items()
+    ]
+    with transaction.atomic():
+        if full_rebuild:
+            # Nothing left to conflict with, so no upsert (the backfill in
+            # migration 0004 runs before the unique index even exists)
+            AttendanceBitmap.objects.all().delete()
+            AttendanceBitmap.objects.bulk_create(bitmaps, batch_size=1000)
+        else:
+            AttendanceBitmap.objects.bulk_create(
+                bitmaps,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['student', 'course', 'term_start'],
+                update_fields=['recorded_days', 'present_days'],
+            )
+    return row_count, len(bitmaps)
+
+
+# Attendance rollups
+#
+# CourseDailyAttendance, StudentMonthlyAttendance and CourseMonthlyAttendance
+# hold present/absent counts per (course, date), (student, month) and
+# (course, month). Each is described by the field that owns the row and the
+# period field, and is refreshed from Attendance with one GROUP BY per table.
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month_start(day):
+    return (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def _rollup_specs(apps=global_apps):
+    return (
+        (apps.get_model('core', 'CourseDailyAttendance'), 'course', 'date'),
+        (apps.get_model('core', 'StudentMonthlyAttendance'), 'student', 'month'),
+        (apps.get_model('core', 'CourseMonthlyAttendance'), 'course', 'month'),
+    )
+
+
+def _rollup_counts(records, owner, period):
+    """{(owner_id, period): (present, absent)} for the given Attendance queryset"""
+    from django.db.models import Count, Q
+    from django.db.models.functions import TruncMonth
+
+    if period == 'month':
+        records = records.annotate(month=TruncMonth('date'))
+    rows = records.order_by().values(f'{owner}_id', period).annotate(
+        present=Count('id', filter=Q(status='Present')),
+        absent=Count('id', filter=Q(status='Absent')),
+    )
+    return {
+        (row[f'{owner}_id'], row[period]): (row['present'], row['absent'])
+        for row in rows
+    }
+
+
+def update_attendance_rollups(records, deleted=False):
+    """
+    Refresh every rollup row touched by the given Attendance rows with one
+    aggregate query per chunk of KEY_CHUNK_SIZE owners and one upsert per
+    rollup table. Call it inside the transaction that wrote the attendance;
+    pass an update's old (student, course, date) too when it moved a record.
+    With deleted=True only existing rollup rows are updated, since the
+    student or course may be going away.
+    """
+    from core.models import Attendance
+
+    records = list(records)
+    if not records:
+        return
+
+    for model, owner, period in _rollup_specs():
+        keys = set()
+        for record in records:
+            day = month_start(record.date) if period == 'month' else record.date
+            keys.add((getattr(record, f'{owner}_id'), day))
+
+        counts = {}
+        for owner_ids, days in key_chunks(keys):
+            attendance = Attendance.objects.filter(**{f'{owner}_id__in': owner_ids})
+            if period == 'month':
+                attendance = attendance.filter(date__gte=min(days), date__lt=next_month_start(max(days)))
+            else:
+                attendance = attendance.filter(date__in=days)
+            counts.update(_rollup_counts(attendance, owner, period))
+
+        if deleted:
+            rollups = []
+            for owner_ids, days in key_chunks(keys):
+                rollups.extend(
+                    rollup for rollup in model.objects.filter(
+                        **{f'{owner}_id__in': owner_ids, f'{period}__in': days}
+                    )
+                    if (getattr(rollup, f'{owner}_id'), getattr(rollup, period)) in keys
+                )
+            for rollup in rollups:
+                key = (getattr(rollup, f'{owner}_id'), getattr(rollup, period))
+                rollup.present_count, rollup.absent_count = counts.get(key, (0, 0))
+            model.objects.bulk_update(rollups, ['present_count', 'absent_count'])
+            continue
+
+        model.objects.bulk_create(
+            [
+                model(**{f'{owner}_id': owner_id, period: day},
+                      present_count=counts.get((owner_id, day), (0, 0))[0],
+                      absent_count=counts.get((owner_id, day), (0, 0))[1])
+                for owner_id, day in keys
+            ],
+            update_conflicts=True,
+            unique_fields=[owner, period],
+            update_fields=['present_count', 'absent_count'],
+        )
+
+
+def rebuild_attendance_rollups(apps=global_apps):
+    """
+    Rebuild all rollup tables from scratch; migrations pass their own `apps`
+    registry. Returns {model name: rows written}
+    """
+    from django.db import transaction
+
+    Attendance = apps.get_model('core', 'Attendance')
+    written = {}
+    with transaction.atomic():
+        for model, owner, period in _rollup_specs(apps):
+            counts = _rollup_counts(Attendance.objects.all(), owner, period)
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [
+                    model(**{f'{owner}_id': owner_id, period: day},
+                          present_count=present, absent_count=absent)
+                    for (owner_id, day), (present, absent) in counts.items()
+                ],
+                batch_size=1000,
+            )
+            written[model.__name__] = len(counts)
+    return written
+
+
+def rollup_attendance_stats(rollups):
+    """Sum a rollup queryset into present/absent/total counts and a percentage"""
+    from django.db.models import Sum
+
+    totals = rollups.aggregate(present=Sum('present_count'), absent=Sum('absent_count'))
+    present = totals['present'] or 0
+    absent = totals['absent'] or 0
+    return {
+        'present_count': present,
+        'absent_count': absent,
+        'total_records': present + absent,
+        'attendance_percentage': attendance_percentage(present, present + absent),
+    }
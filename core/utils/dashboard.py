@@ -0,0 +1,132 @@
+# Dashboard data
+#
+# Each role's dashboard is computed into a plain dict with one or two
+# queries: the headline numbers are scalar subqueries annotated onto a
+# single row (the user's own User, Teacher or Student row), and lists are
+# fetched with values(). Payloads are cached per user and keyed by the data
+# versions of the models they read, which the write signals bump.
+from django.core.cache import cache
+from django.db.models import F, Func, IntegerField, Subquery
+
+from .attendance import attendance_percentage
+from .response_cache import get_data_versions
+
+DASHBOARD_CACHE_TIMEOUT = 60 * 15
+
+# Models each role's dashboard reads; a write to any of them expires it
+DASHBOARD_DEPENDENCIES = {
+    'admin': ('student', 'teacher', 'course', 'enrollment', 'attendance'),
+    'teacher': ('course', 'enrollment', 'grade', 'attendance'),
+    'student': ('course', 'enrollment', 'grade', 'attendance'),
+}
+
+
+def _scalar(queryset, function, field='pk', distinct=False):
+    """
+    Scalar subquery computing `function` (COUNT, SUM...) over the whole
+    queryset; Func rather than an aggregate, so there is no GROUP BY and
+    exactly one row comes back even for an empty table.
+    """
+    template = '%(function)s(DISTINCT %(expressions)s)' if distinct else '%(function)s(%(expressions)s)'
+    values = queryset.order_by().annotate(
+        value=Func(F(field), function=function, template=template, output_field=IntegerField())
+    ).values('value')
+    return Subquery(values, output_field=IntegerField())
+
+
+def _attendance(present, absent):
+    return attendance_percentage(present or 0, (present or 0) + (absent or 0))
+
+
+def admin_dashboard(user):
+    from django.contrib.auth.models import User
+    from core.models import Course, CourseMonthlyAttendance, Enrollment, Student, Teacher
+
+    row = User.objects.filter(pk=user.pk).annotate(
+        total_students=_scalar(Student.objects.all(), 'COUNT'),
+        total_teachers=_scalar(Teacher.objects.all(), 'COUNT'),
+        total_courses=_scalar(Course.objects.all(), 'COUNT'),
+        total_enrollments=_scalar(Enrollment.objects.all(), 'COUNT'),
+        present=_scalar(CourseMonthlyAttendance.objects.all(), 'SUM', 'present_count'),
+        absent=_scalar(CourseMonthlyAttendance.objects.all(), 'SUM', 'absent_count'),
+    ).values(
+        'total_students', 'total_teachers', 'total_courses', 'total_enrollments', 'present', 'absent'
+    ).get()
+
+    school_attendance = _attendance(row.pop('present'), row.pop('absent'))
+    row.update({
+        'attendance_percentage': round(school_attendance),
+        'attendance_ring_offset': round(314 * (1 - school_attendance / 100), 1),
+    })
+    return row
+
+
+def teacher_dashboard(teacher_id):
+    from django.db.models import Count
+    from core.models import Course, CourseMonthlyAttendance, Enrollment, Grade, Teacher
+
+    courses = list(
+        Course.objects.filter(teacher_id=teacher_id).annotate(
+            student_count=Count('enrollment')
+        ).order_by('name').values('id', 'name', 'code', 'student_count')
+    )
+    row = Teacher.objects.filter(pk=teacher_id).annotate(
+        total_students=_scalar(Enrollment.objects.filter(course__teacher_id=teacher_id), 'COUNT', 'student_id', distinct=True),
+        grades_entered=_scalar(Grade.objects.filter(course__teacher_id=teacher_id), 'COUNT'),
+        present=_scalar(CourseMonthlyAttendance.objects.filter(course__teacher_id=teacher_id), 'SUM', 'present_count'),
+        absent=_scalar(CourseMonthlyAttendance.objects.filter(course__teacher_id=teacher_id), 'SUM', 'absent_count'),
+    ).values('total_students', 'grades_entered', 'present', 'absent').get()
+
+    return {
+        'teacher_courses': courses,
+        'total_students': row['total_students'],
+        'grades_entered': row['grades_entered'],
+        'attendance_percentage': round(_attendance(row['present'], row['absent'])),
+    }
+
+
+def student_dashboard(student_id):
+    from core.models import Enrollment, Grade, Student, StudentMonthlyAttendance
+
+    row = Student.objects.filter(pk=student_id).annotate(
+        enrolled_count=_scalar(Enrollment.objects.filter(student_id=student_id), 'COUNT'),
+        present=_scalar(StudentMonthlyAttendance.objects.filter(student_id=student_id), 'SUM', 'present_count'),
+        absent=_scalar(StudentMonthlyAttendance.objects.filter(student_id=student_id), 'SUM', 'absent_count'),
+    ).values('enrolled_count', 'present', 'absent', 'summary__course_count', 'summary__gpa').get()
+
+    recent_grades = [
+        {'course': {'name': course_name}, 'grade': grade, 'marks': marks}
+        for course_name, grade, marks in Grade.objects.filter(student_id=student_id).order_by('-id').values_list(
+            'course__name', 'grade', 'marks'
+        )[:5]
+    ]
+    return {
+        'enrolled_count': row['enrolled_count'],
+        'total_grades': row['summary__course_count'] or 0,
+        'gpa': row['summary__gpa'] or 0.0,
+        'attendance_percentage': round(_attendance(row['present'], row['absent'])),
+        'recent_grades': recent_grades,
+    }
+
+
+def dashboard_cache_key(user_id, role_name, versions):
+    return f'dashboard:{user_id}:{role_name}:{".".join(str(v) for v in versions)}'
+
+
+def get_dashboard_data(user, role):
+    """Dashboard payload for the user's role, from the cache when nothing it reads has changed"""
+    dependencies = DASHBOARD_DEPENDENCIES.get(role.name)
+    if dependencies is None:
+        return {}
+
+    key = dashboard_cache_key(user.pk, role.name, get_data_versions(dependencies))
+    data = cache.get(key)
+    if data is None:
+        if role.is_admin:
+            data = admin_dashboard(user)
+        elif role.is_teacher:
+            data = teacher_dashboard(role.teacher_id)
+        else:
+            data = student_dashboard(role.student_id)
+        cache.set(key, data, DASHBOARD_CACHE_TIMEOUT)
+    return data
@@ -1,4 +1,31 @@
 # Nepali Grading System Utilities
+import math
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python path is used instead
+    np = None
+
+# Threshold table for the Nepali grading scale, lowest band first.
+# A mark belongs to the band of the last threshold it reaches, so
+# bisect_right/searchsorted(side='right') maps marks straight to an index
+# into GRADE_LETTERS/GRADE_POINTS (index 0 is 'E', below every threshold).
+GRADE_THRESHOLDS = [32, 35, 40, 50, 60, 70, 80, 90]
+GRADE_LETTERS = ['E', 'D', 'D+', 'C', 'C+', 'B', 'B+', 'A', 'A+']
+GRADE_POINTS = [0.8, 1.2, 1.6, 2.0, 2.4, 2.8, 3.2, 3.6, 4.0]
+
+if np is not None:
+    _THRESHOLDS_ARRAY = np.array(GRADE_THRESHOLDS, dtype=float)
+    _LETTERS_ARRAY = np.array(GRADE_LETTERS, dtype=object)
+    _POINTS_ARRAY = np.array(GRADE_POINTS, dtype=float)
+
+
+def _check_finite(marks):
+    # NaN and +inf would sort past every threshold and grade as A+
+    if not math.isfinite(marks):
+        raise ValueError('Marks must be finite numbers.')
+
 
 def calculate_nepali_grade(marks):
     """
@@ -14,25 +41,83 @@ def calculate_nepali_grade(marks):
     D+ = 35-39  (GPA: 1.6)
     D  = 32-34  (GPA: 1.2)
     E  = 0-31   (GPA: 0.8)
+
+    Raises ValueError for NaN and infinite marks.
     """
-    if marks >= 90:
-        return 'A+', 4.0
-    elif marks >= 80:
-        return 'A', 3.6
-    elif marks >= 70:
-        return 'B+', 3.2
-    elif marks >= 60:
-        return 'B', 2.8
-    elif marks >= 50:
-        return 'C+', 2.4
-    elif marks >= 40:
-        return 'C', 2.0
-    elif marks >= 35:
-        return 'D+', 1.6
-    elif marks >= 32:
-        return 'D', 1.2
-    else:
-        return 'E', 0.8
+    _check_finite(marks)
+    index = bisect_right(GRADE_THRESHOLDS, marks)
+    return GRADE_LETTERS[index], GRADE_POINTS[index]
+
+
+def calculate_nepali_grades(marks):
+    """
+    Calculate grades for a whole sequence of marks in one pass.
+
+    Accepts any iterable of numbers (list, queryset values_list, NumPy
+    array) and returns two parallel lists: grade letters and grade points,
+    in the same order as the input. Uses NumPy's searchsorted over the
+    threshold table when NumPy is installed, otherwise a bisect per mark.
+    Raises ValueError if any mark is NaN or infinite.
+    """
+    if not hasattr(marks, '__len__'):
+        marks = list(marks)
+
+    if np is not None:
+        values = np.asarray(marks, dtype=float)
+        if not np.isfinite(values).all():
+            raise ValueError('Marks must be finite numbers.')
+        indexes = np.searchsorted(_THRESHOLDS_ARRAY, values, side='right')
+        return _LETTERS_ARRAY[indexes].tolist(), _POINTS_ARRAY[indexes].tolist()
+
+    for mark in marks:
+        _check_finite(mark)
+    indexes = [bisect_right(GRADE_THRESHOLDS, mark) for mark in marks]
+    return [GRADE_LETTERS[i] for i in indexes], [GRADE_POINTS[i] for i in indexes]
+
+# Grade letters from best to worst, the order distributions are reported in
+NEPALI_GRADE_ORDER = GRADE_LETTERS[::-1]
+
+# Breakdowns supported by get_grade_distribution
+DISTRIBUTION_GROUPINGS = {
+    'course': 'course__code',
+    'class': 'student__student_class',
+}
+
+def _empty_distribution():
+    return {letter: 0 for letter in NEPALI_GRADE_ORDER}
+
+def get_grade_distribution(grades=None, by=None):
+    """
+    Count grades per Nepali grade letter with a single GROUP BY query.
+
+    `grades` optionally restricts the count to a Grade queryset (e.g. a
+    teacher's courses). Without `by` the result is {'A+': n, ..., 'E': n};
+    with by='course' or by='class' it is {course code or class: {...}}.
+    """
+    from django.db.models import Count
+    from core.models import Grade
+    
+    if grades is None:
+        grades = Grade.objects.all()
+    if by is not None and by not in DISTRIBUTION_GROUPINGS:
+        raise ValueError(f"Unknown distribution grouping: {by}")
+    
+    group_fields = ['grade']
+    if by is not None:
+        group_fields.insert(0, DISTRIBUTION_GROUPINGS[by])
+    rows = grades.order_by().values(*group_fields).annotate(count=Count('id'))
+    
+    if by is None:
+        distribution = _empty_distribution()
+        for row in rows:
+            distribution[row['grade']] = distribution.get(row['grade'], 0) + row['count']
+        return distribution
+    
+    distribution = {}
+    for row in rows:
+        counts = distribution.setdefault(row[group_fields[0]], _empty_distribution())
+        counts[row['grade']] = counts.get(row['grade'], 0) + row['count']
+    return distribution
 
 def get_grade_point(grade):
     """Get GPA point for a specific grade"""
@@ -62,6 +147,86 @@ def calculate_student_gpa(student):
     
     return round(total_points / total_courses, 2)
 
+def _summary_values(count, total_marks, total_points, best_point):
+    """Build StudentSummary field values from aggregated grade totals"""
+    if not count:
+        return {'gpa': 0.0, 'course_count': 0, 'total_marks': 0.0, 'best_grade': ''}
+    return {
+        'gpa': round(total_points / count, 2),
+        'course_count': count,
+        'total_marks': total_marks,
+        'best_grade': GRADE_LETTERS[GRADE_POINTS.index(best_point)] if best_point in GRADE_POINTS else '',
+    }
+
+def update_student_summary(student_id, create=True):
+    """
+    Refresh the persisted academic summary for a single student.
+    With create=False an existing summary is updated but none is created,
+    which is what deletes need (the student may be going away too).
+    """
+    from django.db.models import Count, Max, Sum
+    from core.models import Grade, StudentSummary
+    
+    totals = Grade.objects.filter(student_id=student_id).aggregate(
+        count=Count('id'),
+        total_marks=Sum('marks'),
+        total_points=Sum('grade_point'),
+        best_point=Max('grade_point'),
+    )
+    values = _summary_values(**totals)
+    if not create:
+        StudentSummary.objects.filter(student_id=student_id).update(**values)
+        return
+    StudentSummary.objects.update_or_create(student_id=student_id, defaults=values)
+
+def rebuild_student_summaries(student_ids=None, batch_size=10000):
+    """
+    Rebuild academic summaries for all students (or only `student_ids`,
+    `batch_size` ids at a time so the id lists stay within SQLite's limits)
+    from a GROUP BY over grades, written back with one upsert per batch.
+    Returns the number of summaries written.
+    """
+    from core.models import Grade, Student
+    
+    if student_ids is None:
+        return _rebuild_summaries(Student.objects.all(), Grade.objects.all())
+    
+    student_ids = sorted(set(student_ids))
+    written = 0
+    for start in range(0, len(student_ids), batch_size):
+        batch = student_ids[start:start + batch_size]
+        written += _rebuild_summaries(Student.objects.filter(id__in=batch), Grade.objects.filter(student_id__in=batch))
+    return written
+
+def _rebuild_summaries(students, grades):
+    from django.db import transaction
+    from django.db.models import Count, Max, Sum
+    from core.models import StudentSummary
+    
+    totals = {
+        row.pop('student_id'): row
+        for row in grades.values('student_id').annotate(
+            count=Count('id'),
+            total_marks=Sum('marks'),
+            total_points=Sum('grade_point'),
+            best_point=Max('grade_point'),
+        ).order_by()
+    }
+    empty = {'count': 0, 'total_marks': 0.0, 'total_points': 0.0, 'best_point': None}
+    summaries = [
+        StudentSummary(student_id=student_id, **_summary_values(**totals.get(student_id, empty)))
+        for student_id in students.values_list('id', flat=True).iterator()
+    ]
+    
+    with transaction.atomic():
+        StudentSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=['gpa', 'course_count', 'total_marks', 'best_grade'],
+        )
+    return len(summaries)
+
 def get_grade_description(grade):
     """Get description for grade"""
     descriptions = {
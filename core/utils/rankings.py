@@ -0,0 +1,108 @@
+# Class and course ranking utilities
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Window
+from django.db.models.functions import DenseRank, PercentRank
+
+RANKINGS_CACHE_TIMEOUT = 60 * 15
+
+
+def class_rankings_cache_key(student_class):
+    return f'rankings:class:{student_class}'
+
+
+def course_rankings_cache_key(course_id):
+    return f'rankings:course:{course_id}'
+
+
+def _percentile(percent_rank):
+    return round(percent_rank * 100, 1)
+
+
+def get_class_rankings(student_class):
+    """
+    Rank every graded student in a class by GPA (ties broken by average marks).
+
+    Averages, dense ranks and percentiles are computed by the database in a
+    single query; the result is cached per class until a grade changes.
+    """
+    key = class_rankings_cache_key(student_class)
+    rankings = cache.get(key)
+    if rankings is not None:
+        return rankings
+
+    from core.models import Student
+
+    order = [F('gpa').desc(), F('average_marks').desc()]
+    rows = Student.objects.filter(student_class=student_class).annotate(
+        gpa=Avg('grade__grade_point'),
+        average_marks=Avg('grade__marks'),
+        course_count=Count('grade'),
+    ).filter(course_count__gt=0).annotate(
+        rank=Window(DenseRank(), order_by=order),
+        percent_rank=Window(PercentRank(), order_by=[F('gpa').asc(), F('average_marks').asc()]),
+    ).order_by('rank', 'roll_no').values(
+        'id', 'name', 'roll_no', 'gpa', 'average_marks', 'course_count', 'rank', 'percent_rank'
+    )
+
+    rankings = [
+        {
+            'student_id': row['id'],
+            'name': row['name'],
+            'roll_no': row['roll_no'],
+            'gpa': round(row['gpa'], 2),
+            'average_marks': round(row['average_marks'], 2),
+            'course_count': row['course_count'],
+            'rank': row['rank'],
+            'percentile': _percentile(row['percent_rank']),
+        }
+        for row in rows
+    ]
+    cache.set(key, rankings, RANKINGS_CACHE_TIMEOUT)
+    return rankings
+
+
+def get_course_rankings(course_id):
+    """
+    Rank every graded student in a course by marks, with dense rank and
+    percentile computed by the database in a single query. Cached per course
+    until a grade in the course changes.
+    """
+    key = course_rankings_cache_key(course_id)
+    rankings = cache.get(key)
+    if rankings is not None:
+        return rankings
+
+    from core.models import Grade
+
+    rows = Grade.objects.filter(course_id=course_id).annotate(
+        rank=Window(DenseRank(), order_by=F('marks').desc()),
+        percent_rank=Window(PercentRank(), order_by=F('marks').asc()),
+    ).order_by('rank', 'student__roll_no').values(
+        'student_id', 'student__name', 'student__roll_no', 'student__student_class',
+        'marks', 'grade', 'grade_point', 'rank', 'percent_rank'
+    )
+
+    rankings = [
+        {
+            'student_id': row['student_id'],
+            'name': row['student__name'],
+            'roll_no': row['student__roll_no'],
+            'student_class': row['student__student_class'],
+            'marks': row['marks'],
+            'grade': row['grade'],
+            'grade_point': row['grade_point'],
+            'rank': row['rank'],
+            'percentile': _percentile(row['percent_rank']),
+        }
+        for row in rows
+    ]
+    cache.set(key, rankings, RANKINGS_CACHE_TIMEOUT)
+    return rankings
+
+
+def invalidate_rankings(student_classes=(), course_ids=()):
+    """Drop cached rankings for the given classes and courses"""
+    keys = [class_rankings_cache_key(c) for c in student_classes if c is not None]
+    keys += [course_rankings_cache_key(c) for c in course_ids if c is not None]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,63 @@
+# API response cache utilities
+#
+# Cached responses are keyed by the endpoint, the caller's role and scoping
+# id, the full request URL and the current data version of every model the
+# endpoint reads. Writes bump the model's version (see core.signals), which
+# changes the key, so stale entries are never read again and simply expire.
+import hashlib
+import time
+
+from django.core.cache import cache
+
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+
+
+def data_version_key(model_name):
+    return f'data_version:{model_name}'
+
+
+def _fresh_version():
+    # Time-based, so a version lost to cache eviction can't come back as an old value
+    return time.time_ns()
+
+
+def get_data_versions(model_names):
+    """Current data version of each model, in the order given"""
+    keys = [data_version_key(name) for name in model_names]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _fresh_version(), timeout=None)
+        # Another worker may have added some first; read back whichever won
+        versions.update(cache.get_many(missing))
+    return [versions.get(key) for key in keys]
+
+
+def bump_data_version(*model_names):
+    """Invalidate every cached response that read any of these models"""
+    # Not incr(): on the database cache that is a get and a set, and the set
+    # would give the version the default timeout
+    version = _fresh_version()
+    cache.set_many({data_version_key(name): version for name in model_names}, timeout=None)
+
+
+def user_scope(user):
+    """(role, scoping id) deciding which rows a user can see"""
+    from core.roles import role_of
+
+    if user.is_staff:
+        return 'admin', None
+    role = role_of(user)
+    if role.teacher_id is not None:
+        return 'teacher', role.teacher_id
+    if role.student_id is not None:
+        return 'student', role.student_id
+    return 'none', user.pk
+
+
+def response_cache_key(endpoint, request, model_names):
+    role, scope_id = user_scope(request.user)
+    versions = '.'.join(str(version) for version in get_data_versions(model_names))
+    url = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return f'response:{endpoint}:{role}:{scope_id}:{url}:{versions}'
@@ -0,0 +1,43 @@
+# Course roster utilities
+from django.core.cache import cache
+
+ROSTER_CACHE_TIMEOUT = 60 * 15
+
+
+def course_roster_cache_key(course_id):
+    return f'roster:course:{course_id}'
+
+
+def get_course_roster(course_id):
+    """
+    Students enrolled in a course, ordered by name, as plain dicts shaped
+    like the enrollments the course page renders. Read with a single
+    query and cached per course until its enrollments or their students
+    change.
+    """
+    key = course_roster_cache_key(course_id)
+    roster = cache.get(key)
+    if roster is not None:
+        return roster
+
+    from core.models import Enrollment
+
+    rows = Enrollment.objects.filter(course_id=course_id).order_by('student__name', 'student_id').values_list(
+        'student_id', 'student__name', 'student__roll_no', 'student__student_class', 'date_joined'
+    )
+    roster = [
+        {
+            'student': {'id': student_id, 'name': name, 'roll_no': roll_no, 'student_class': student_class},
+            'date_joined': date_joined,
+        }
+        for student_id, name, roll_no, student_class, date_joined in rows
+    ]
+    cache.set(key, roster, ROSTER_CACHE_TIMEOUT)
+    return roster
+
+
+def invalidate_course_rosters(course_ids):
+    """Drop the cached rosters of the given courses"""
+    keys = [course_roster_cache_key(c) for c in set(course_ids) if c is not None]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,120 @@
+# Full-text search
+#
+# Students, teachers and courses are mirrored into one SQLite FTS5 table
+# (created by migration 0007) with title, detail and body columns. Each
+# row's rowid packs the source object's primary key with a two-bit kind
+# tag, so a row is replaced or removed by rowid alone and the kind of a
+# match is read straight off it. Matches are ranked by bm25 with the title
+# weighted highest. On other database backends there is no index and
+# searches return nothing.
+from django.db import connection, transaction
+
+SEARCH_TABLE = 'core_search_index'
+SEARCH_RESULT_LIMIT = 20
+SEARCH_BATCH_SIZE = 2000
+
+# kind -> (rowid tag, model name, fields mirrored as title, detail, body)
+SEARCH_SOURCES = {
+    'student': (1, 'Student', ('name', 'roll_no', 'email')),
+    'teacher': (2, 'Teacher', ('name', 'subject')),
+    'course': (3, 'Course', ('name', 'code', 'description')),
+}
+_KIND_BY_TAG = {tag: kind for kind, (tag, _, _) in SEARCH_SOURCES.items()}
+
+_INSERT = f'INSERT INTO {SEARCH_TABLE} (rowid, title, detail, body) VALUES (%s, %s, %s, %s)'
+_DELETE = f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s'
+
+
+def search_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def search_rowid(kind, pk):
+    return pk << 2 | SEARCH_SOURCES[kind][0]
+
+
+def _entry(kind, pk, values):
+    values = [value or '' for value in values]
+    return (search_rowid(kind, pk), *values, *[''] * (3 - len(values)))
+
+
+def index_instance(instance):
+    """Add or refresh the search entry of a student, teacher or course"""
+    kind = instance._meta.model_name
+    if kind not in SEARCH_SOURCES or not search_enabled():
+        return
+    fields = SEARCH_SOURCES[kind][2]
+    row = _entry(kind, instance.pk, [getattr(instance, field) for field in fields])
+    with connection.cursor() as cursor:
+        cursor.execute(_DELETE, [row[0]])
+        cursor.execute(_INSERT, row)
+
+
+def remove_instance(instance):
+    kind = instance._meta.model_name
+    if kind not in SEARCH_SOURCES or not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(_DELETE, [search_rowid(kind, instance.pk)])
+
+
+def rebuild_search_index():
+    """Repopulate the whole index from the source tables; returns {kind: rows indexed}"""
+    from django.apps import apps
+
+    if not search_enabled():
+        return {}
+
+    counts = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        for kind, (_, model_name, fields) in SEARCH_SOURCES.items():
+            rows = apps.get_model('core', model_name).objects.values_list('pk', *fields)
+            batch, counts[kind] = [], 0
+            for pk, *values in rows.iterator(chunk_size=SEARCH_BATCH_SIZE):
+                batch.append(_entry(kind, pk, values))
+                if len(batch) >= SEARCH_BATCH_SIZE:
+                    cursor.executemany(_INSERT, batch)
+                    counts[kind] += len(batch)
+                    batch = []
+            cursor.executemany(_INSERT, batch)
+            counts[kind] += len(batch)
+        # Merge the index b-trees written above into one
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return counts
+
+
+def match_expression(query):
+    """
+    FTS5 query for free text: every word must match as a prefix. Words are
+    quoted, so operators and punctuation in the input are taken literally.
+    """
+    terms = []
+    for word in query.split():
+        # Quoted strings go through the tokenizer, so 'a@b.c' becomes a phrase
+        if any(char.isalnum() for char in word):
+            terms.append('"{}"*'.format(word.replace('"', '""')))
+    return ' '.join(terms)
+
+
+def search(query, kinds=None, limit=SEARCH_RESULT_LIMIT):
+    """Best matches for `query` as dicts with type, id, title and detail, best first"""
+    expression = match_expression(query)
+    if not expression or not search_enabled():
+        return []
+
+    sql = f'SELECT rowid, title, detail FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+    params = [expression]
+    if kinds is not None:
+        tags = [SEARCH_SOURCES[kind][0] for kind in kinds]
+        sql += f' AND (rowid & 3) IN ({", ".join(["%s"] * len(tags))})'
+        params += tags
+    sql += ' ORDER BY rank LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            {'type': _KIND_BY_TAG[rowid & 3], 'id': rowid >> 2, 'title': title, 'detail': detail}
+            for rowid, title, detail in cursor.fetchall()
+        ]
@@ -1,22 +1,51 @@
+import datetime
+import math
+
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.contrib.auth.models import User
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from .models import Student, Teacher, Course, Enrollment, Attendance, Grade
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.db import transaction
+from django.core.paginator import Paginator
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from .models import (
+    Student, Teacher, Course, Enrollment, Attendance, Grade, StudentSummary,
+    CourseDailyAttendance, CourseMonthlyAttendance
+)
 from .serializers import (
     StudentSerializer, TeacherSerializer, CourseSerializer,
     EnrollmentSerializer, AttendanceSerializer, GradeSerializer
 )
+from .mixins import BulkUpsertMixin, CachedResponseMixin, CascadeDestroyMixin, EagerLoadingMixin, FastListMixin, eager_load
 from .permissions import IsAdmin, IsTeacher, IsStudent, IsTeacherOrAdmin, IsOwnerOrAdmin
+from .query_budget import query_budget
+from .roles import role_of
 from .forms import GradeEntryForm, BulkGradeEntryForm, AttendanceEntryForm, BulkAttendanceForm
+from .utils.attendance import (
+    attendance_percentage, get_attendance_stats, record_attendance, update_attendance_rollups
+)
+from .utils.dashboard import get_dashboard_data
+from .utils.exports import streaming_export
+from .utils.grading import (
+    calculate_nepali_grades, get_grade_distribution, rebuild_student_summaries, DISTRIBUTION_GROUPINGS
+)
+from .utils.rankings import get_class_rankings, get_course_rankings, invalidate_rankings
+from .utils.rosters import get_course_roster, invalidate_course_rosters
+from .utils.response_cache import bump_data_version
+from .utils.search import search
 
 
 # Template Views
+@query_budget(10)
 def login_view(request):
     if request.method == 'POST':
         username = request.POST['username']
@@ -30,190 +59,230 @@ def login_view(request):
     return render(request, 'core/login.html')
 
 
+@query_budget(5)
 def logout_view(request):
     logout(request)
     return redirect('login')
 
 
+@query_budget(10)
 @login_required
 def dashboard_view(request):
     context = {
         'user': request.user,
     }
-    
-    if request.user.is_staff:
-        # Admin dashboard data
-        context.update({
-            'total_students': Student.objects.count(),
-            'total_teachers': Teacher.objects.count(),
-            'total_courses': Course.objects.count(),
-            'total_enrollments': Enrollment.objects.count(),
-        })
-    elif hasattr(request.user, 'teacher'):
-        # Teacher dashboard data
-        teacher_courses = Course.objects.filter(teacher=request.user.teacher)
-        grades_entered = Grade.objects.filter(course__teacher=request.user.teacher).count()
-        
-        # Count students enrolled in this teacher's courses
-        enrolled_student_ids = Enrollment.objects.filter(course__teacher=request.user.teacher).values_list('student_id', flat=True).distinct()
-        total_students_count = len(enrolled_student_ids)
-        
-        context.update({
-            'my_courses': teacher_courses,
-            'teacher_courses': teacher_courses,
-            'total_students': total_students_count,
-            'grades_entered': grades_entered,
-        })
-    elif hasattr(request.user, 'student'):
-        # Student dashboard data
-        student_enrollments = Enrollment.objects.filter(student=request.user.student)
-        student_grades = Grade.objects.filter(student=request.user.student)
-        total_attendance = Attendance.objects.filter(student=request.user.student).count()
-        present_attendance = Attendance.objects.filter(student=request.user.student, status='Present').count()
-        attendance_percentage = round((present_attendance / total_attendance * 100) if total_attendance > 0 else 0)
-        
-        context.update({
-            'my_enrollments': student_enrollments,
-            'enrolled_courses': student_enrollments,
-            'total_grades': student_grades.count(),
-            'attendance_percentage': attendance_percentage,
-            'recent_grades': student_grades.order_by('-id')[:5],  # using -id instead of -created_at
-        })
-    
+    # One or two aggregate queries per role, cached until the data they read changes
+    context.update(get_dashboard_data(request.user, request.role))
     return render(request, 'core/dashboard.html', context)
 
 
+@query_budget(8)
 @login_required
 def profile_view(request):
     return render(request, 'core/profile.html', {'user': request.user})
 
 
+STUDENT_DIRECTORY_PAGE_SIZE = 24
+
+
+def _count_per_student(model):
+    """Number of `model` rows per student, as a subquery annotation"""
+    counts = model.objects.filter(student_id=OuterRef('pk')).order_by().values('student_id').annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def filter_students(students, params, courses):
+    """Apply the directory's search and filters from the query string; returns (students, filters)"""
+    filters = {name: params.get(name, '').strip() for name in ('q', 'class', 'gender', 'course')}
+    if filters['q']:
+        students = students.filter(Q(name__istartswith=filters['q']) | Q(roll_no__istartswith=filters['q']))
+    if filters['class']:
+        students = students.filter(student_class=filters['class'])
+    if filters['gender']:
+        students = students.filter(gender=filters['gender'])
+    if filters['course'].isdigit():
+        # Only courses the viewer can pick from; any other id matches nobody
+        students = students.filter(id__in=Enrollment.objects.filter(
+            course_id=filters['course'], course__in=courses
+        ).values('student_id'))
+    return students, filters
+
+
+def student_directory(request, students, courses, template, fragment_template, fragment_url, fragment):
+    """
+    Render one page of a student directory. The full page carries the
+    filter form; `fragment` requests (infinite scroll) render just the next
+    page's cards, ending with a sentinel that links to the page after.
+    """
+    filtered, filters = filter_students(students, request.GET, courses)
+    page_obj = Paginator(filtered.order_by('name', 'id'), STUDENT_DIRECTORY_PAGE_SIZE).get_page(request.GET.get('page'))
+    
+    next_url = None
+    if page_obj.has_next():
+        query = request.GET.copy()
+        query['page'] = page_obj.next_page_number()
+        next_url = f'{reverse(fragment_url)}?{query.urlencode()}'
+    
+    context = {'students': page_obj.object_list, 'page_obj': page_obj, 'next_url': next_url}
+    if fragment:
+        return render(request, fragment_template, context)
+    
+    options = students.order_by().values_list('student_class', 'gender').distinct()
+    context.update({
+        'filters': filters,
+        'class_options': sorted({student_class for student_class, _ in options if student_class}),
+        'gender_options': sorted({gender for _, gender in options if gender}),
+        'course_options': list(courses.order_by('code').values('id', 'code')),
+    })
+    return render(request, template, context)
+
+
+@query_budget(12)
 @login_required 
-def student_list_view(request):
-    if not (request.user.is_staff or hasattr(request.user, 'teacher')):
+def student_list_view(request, fragment=False):
+    if not (request.role.is_admin or request.role.is_teacher):
         messages.error(request, 'You do not have permission to view this page.')
         return redirect('dashboard')
     
-    students = Student.objects.all()
-    return render(request, 'core/student_list.html', {'students': students})
+    return student_directory(
+        request, Student.objects.all(), Course.objects.all(),
+        'core/student_list.html', 'core/partials/student_cards.html', 'student_list_fragment', fragment
+    )
 
 
+@query_budget(10)
 @login_required
 def teacher_list_view(request):
     if not request.user.is_staff:
         messages.error(request, 'You do not have permission to view this page.')
         return redirect('dashboard')
     
-    teachers = Teacher.objects.all()
+    teachers = Teacher.objects.prefetch_related('course_set')
     return render(request, 'core/teacher_list.html', {'teachers': teachers})
 
 
+@query_budget(10)
 @login_required
 def course_list_view(request):
-    if not (request.user.is_staff or hasattr(request.user, 'teacher') or hasattr(request.user, 'student')):
+    if not (request.role.is_admin or request.role.is_teacher or request.role.is_student):
         messages.error(request, 'You do not have permission to view this page.')
         return redirect('dashboard')
     
-    if hasattr(request.user, 'teacher'):
+    courses = Course.objects.select_related('teacher').annotate(student_count=Count('enrollment'))
+    if request.role.is_teacher:
         # Teacher can only see their own courses
-        courses = Course.objects.filter(teacher=request.user.teacher)
-        context = {'courses': courses}
-    elif hasattr(request.user, 'student'):
-        # Student can see courses they're enrolled in
-        enrollments = Enrollment.objects.filter(student=request.user.student)
-        courses = [enrollment.course for enrollment in enrollments]
-        context = {'courses': courses, 'enrollments': enrollments}
-    else:
-        # Staff can see all courses
-        courses = Course.objects.all()
-        context = {'courses': courses}
+        courses = courses.filter(teacher_id=request.role.teacher_id)
+    elif request.role.is_student:
+        # Student can see courses they're enrolled in; a subquery, so the
+        # count still covers every enrollment in the course
+        courses = courses.filter(
+            id__in=Enrollment.objects.filter(student_id=request.role.student_id).values('course_id')
+        )
+    # Staff can see all courses
+    context = {
+        'courses': list(courses.order_by('name', 'id')),
+        'total_students': Enrollment.objects.filter(
+            course__in=courses.values('id')
+        ).values('student_id').distinct().count(),
+    }
     
     return render(request, 'core/course_list.html', context)
 
 
+@query_budget(13)
 @login_required
-def teacher_students_view(request):
-    if not hasattr(request.user, 'teacher'):
+def teacher_students_view(request, fragment=False):
+    if not request.role.is_teacher:
         messages.error(request, 'You must be a teacher to view this page.')
         return redirect('dashboard')
     
-    # Get all students enrolled in this teacher's courses
-    teacher_courses = Course.objects.filter(teacher=request.user.teacher)
-    enrolled_students = Student.objects.filter(
-        enrollment__course__in=teacher_courses
-    ).distinct()
-    
-    return render(request, 'core/teacher_students.html', {
-        'students': enrolled_students,
-        'teacher_courses': teacher_courses
-    })
+    # Students enrolled in this teacher's courses, with the per-card numbers
+    # annotated and only this teacher's enrollments prefetched
+    teacher_id = request.role.teacher_id
+    teacher_enrollments = Enrollment.objects.filter(course__teacher_id=teacher_id)
+    students = Student.objects.filter(
+        id__in=teacher_enrollments.values('student_id')
+    ).annotate(
+        grade_count=_count_per_student(Grade),
+        attendance_count=_count_per_student(Attendance),
+    ).prefetch_related(Prefetch(
+        'enrollment_set',
+        queryset=teacher_enrollments.select_related('course').order_by('course__code'),
+        to_attr='teacher_enrollments',
+    ))
+    
+    return student_directory(
+        request, students, Course.objects.filter(teacher_id=teacher_id),
+        'core/teacher_students.html', 'core/partials/teacher_student_cards.html', 'teacher_students_fragment', fragment
+    )
+
+
+@query_budget(10)
+@login_required
+def search_view(request):
+    query = request.GET.get('q', '').strip()
+    results = search(query, searchable_kinds(request.user)) if query else []
+    for result in results:
+        result['url'] = search_result_url(request.role, result)
+    return render(request, 'core/search.html', {'search_query': query, 'results': results})
 
 
+@query_budget(10)
 @login_required
 def course_detail_view(request, course_id):
     try:
-        course = Course.objects.get(id=course_id)
-        enrollments = Enrollment.objects.filter(course=course)
-        return render(request, 'core/course_detail.html', {
-            'course': course, 
-            'enrollments': enrollments
-        })
+        course = Course.objects.select_related('teacher').get(id=course_id)
     except Course.DoesNotExist:
         messages.error(request, 'Course not found.')
         return redirect('dashboard')
+    
+    return render(request, 'core/course_detail.html', {
+        'course': course, 
+        'enrollments': get_course_roster(course.id)
+    })
 
 
+@query_budget(10)
 @login_required
 def my_attendance_view(request):
-    if not hasattr(request.user, 'student'):
+    if not request.role.is_student:
         messages.error(request, 'You must be a student to view this page.')
         return redirect('dashboard')
     
-    attendance_records = Attendance.objects.filter(student=request.user.student).order_by('-date')
+    attendance_records = Attendance.objects.filter(student_id=request.role.student_id).select_related('course').order_by('-date')
     
-    # Calculate attendance statistics
-    present_count = attendance_records.filter(status='Present').count()
-    absent_count = attendance_records.filter(status='Absent').count()
-    total_records = attendance_records.count()
-    
-    attendance_percentage = round((present_count / total_records * 100) if total_records > 0 else 0, 1)
+    # Attendance statistics come from the packed per-term bitmaps
+    stats = get_attendance_stats(request.role.student_id)
     
     return render(request, 'core/my_attendance.html', {
         'attendance_records': attendance_records,
-        'present_count': present_count,
-        'absent_count': absent_count,
-        'attendance_percentage': attendance_percentage
+        'present_count': stats['present_count'],
+        'absent_count': stats['absent_count'],
+        'attendance_percentage': stats['attendance_percentage']
     })
 
 
+@query_budget(11)
 @login_required
 def my_grades_view(request):
-    if not hasattr(request.user, 'student'):
+    if not request.role.is_student:
         messages.error(request, 'You must be a student to view this page.')
         return redirect('dashboard')
     
-    grades = Grade.objects.filter(student=request.user.student).select_related('course', 'course__teacher')
+    grades = Grade.objects.filter(student_id=request.role.student_id).select_related('course', 'course__teacher')
+    summary = StudentSummary.objects.filter(student_id=request.role.student_id).first()
     
-    # Calculate grade statistics using Nepali grading system
-    if grades:
-        total_marks = sum(grade.marks for grade in grades)
-        average_marks = total_marks / len(grades)
-        total_courses = grades.count()
-        
-        # Calculate GPA using the new student.gpa property
-        gpa = request.user.student.gpa
-        
-        # Get highest grade using Nepali grading system
-        nepali_grade_list = ['A+', 'A', 'B+', 'B', 'C+', 'C', 'D+', 'D', 'E']
-        highest_grade = min((grade.grade for grade in grades), key=lambda x: nepali_grade_list.index(x) if x in nepali_grade_list else 99)
+    # Grade statistics come from the persisted academic summary
+    if summary and summary.course_count:
+        average_marks = summary.average_marks
+        total_courses = summary.course_count
+        highest_grade = summary.best_grade or 'N/A'
+        gpa = summary.gpa
         
         # Grade distribution
-        grade_distribution = {}
-        for grade in grades:
-            if grade.grade in grade_distribution:
-                grade_distribution[grade.grade] += 1
-            else:
-                grade_distribution[grade.grade] = 1
+        grade_distribution = get_grade_distribution(grades)
     else:
         average_marks = 0
         total_courses = 0
@@ -231,15 +300,17 @@ def my_grades_view(request):
     })
 
 
+@query_budget(11)
 @login_required
 def attendance_mark_view(request):
-    if not (request.user.is_staff or hasattr(request.user, 'teacher')):
+    if not (request.role.is_admin or request.role.is_teacher):
         messages.error(request, 'You do not have permission to view this page.')
         return redirect('dashboard')
     
     # Get statistics for teacher
-    if hasattr(request.user, 'teacher'):
-        teacher_courses = Course.objects.filter(teacher=request.user.teacher)
+    teacher_courses = None
+    if request.role.is_teacher:
+        teacher_courses = Course.objects.filter(teacher_id=request.role.teacher_id)
         total_students = Student.objects.filter(enrollment__course__in=teacher_courses).distinct().count()
         total_courses = teacher_courses.count()
     else:
@@ -248,19 +319,21 @@ def attendance_mark_view(request):
     
     return render(request, 'core/attendance_mark.html', {
         'total_students': total_students,
-        'total_courses': total_courses
+        'total_courses': total_courses,
+        'teacher_courses': teacher_courses,
     })
 
 
+@query_budget(22)
 @login_required
 def grade_entry_view(request):
-    if not (request.user.is_staff or hasattr(request.user, 'teacher')):
+    if not (request.role.is_admin or request.role.is_teacher):
         messages.error(request, 'You do not have permission to view this page.')
         return redirect('dashboard')
     
     teacher = None
-    if hasattr(request.user, 'teacher'):
-        teacher = request.user.teacher
+    if request.role.is_teacher:
+        teacher = request.profile
     
     # Handle single grade entry form
     grade_form = GradeEntryForm(teacher=teacher)
@@ -288,81 +361,96 @@ def grade_entry_view(request):
         grades = Grade.objects.all().select_related('student', 'course')
     
     # Grade statistics
-    a_grades = grades.filter(grade__in=['A+', 'A', 'A-']).count()
-    b_grades = grades.filter(grade__in=['B+', 'B', 'B-']).count()
-    c_grades = grades.filter(grade__in=['C+', 'C', 'C-']).count()
-    d_grades = grades.filter(grade='D').count()
-    f_grades = grades.filter(grade='F').count()
+    distribution = get_grade_distribution(grades)
     
     return render(request, 'core/grade_entry.html', {
         'grade_form': grade_form,
         'bulk_form': bulk_form,
         'grades': grades,
-        'a_grades': a_grades,
-        'b_grades': b_grades,
-        'c_grades': c_grades,
-        'd_grades': d_grades,
-        'f_grades': f_grades,
+        'a_grades': distribution['A+'] + distribution['A'],
+        'b_grades': distribution['B+'] + distribution['B'],
+        'c_grades': distribution['C+'] + distribution['C'],
+        'd_grades': distribution['D+'] + distribution['D'],
+        'e_grades': distribution['E'],
+        'total_grades': sum(distribution.values()),
         'teacher': teacher
     })
 
 
+@query_budget(20)
 @login_required
 def bulk_grade_entry_view(request, course_id):
-    if not (request.user.is_staff or hasattr(request.user, 'teacher')):
+    if not (request.role.is_admin or request.role.is_teacher):
         messages.error(request, 'You do not have permission to view this page.')
         return redirect('dashboard')
     
     course = get_object_or_404(Course, id=course_id)
-    teacher = None
     
-    if hasattr(request.user, 'teacher'):
-        teacher = request.user.teacher
-        if course.teacher != teacher:
+    if request.role.is_teacher:
+        if course.teacher_id != request.role.teacher_id:
             messages.error(request, 'You can only enter grades for your own courses.')
             return redirect('grade_entry')
     
-    # Get enrolled students
-    enrollments = Enrollment.objects.filter(course=course).select_related('student')
-    students = [enrollment.student for enrollment in enrollments]
-    
     if request.method == 'POST':
-        success_count = 0
+        enrolled_ids = Enrollment.objects.filter(course=course).values_list('student_id', flat=True)
+        
+        marked_ids = []
+        marks_list = []
         error_count = 0
+        for student_id in enrolled_ids:
+            raw_marks = request.POST.get(f'marks_{student_id}')
+            if not raw_marks:
+                continue
+            try:
+                marks = float(raw_marks)
+            except (ValueError, TypeError):
+                error_count += 1
+                continue
+            if not math.isfinite(marks):
+                error_count += 1
+                continue
+            marks_list.append(marks)
+            marked_ids.append(student_id)
         
-        for student in students:
-            marks_key = f'marks_{student.id}'
-            grade_key = f'grade_{student.id}'
-            
-            if marks_key in request.POST and request.POST[marks_key]:
-                try:
-                    marks = float(request.POST[marks_key])
-                    grade_letter = request.POST.get(grade_key, '')
-                    
-                    # Create or update grade
-                    grade, created = Grade.objects.update_or_create(
-                        student=student,
-                        course=course,
-                        defaults={
-                            'marks': marks,
-                            'grade': grade_letter
-                        }
-                    )
-                    success_count += 1
-                except (ValueError, TypeError):
-                    error_count += 1
+        # Grade the whole course in one pass; Grade.save() is bypassed below
+        letters, points = calculate_nepali_grades(marks_list)
+        grades = [
+            Grade(student_id=student_id, course=course, marks=marks, grade=letter, grade_point=point)
+            for student_id, marks, letter, point in zip(marked_ids, marks_list, letters, points)
+        ]
+        
+        # Insert or update the whole roster in one statement
+        with transaction.atomic():
+            Grade.objects.bulk_create(
+                grades,
+                update_conflicts=True,
+                unique_fields=['student', 'course'],
+                update_fields=['marks', 'grade', 'grade_point']
+            )
+            # bulk_create skips the Grade signals, so refresh summaries and rankings here
+            if grades:
+                rebuild_student_summaries(marked_ids)
+                invalidate_rankings(
+                    set(Student.objects.filter(id__in=marked_ids).values_list('student_class', flat=True)),
+                    [course.id]
+                )
+                transaction.on_commit(lambda: bump_data_version('grade'))
         
-        if success_count > 0:
-            messages.success(request, f'Successfully entered/updated {success_count} grades.')
+        if grades:
+            messages.success(request, f'Successfully entered/updated {len(grades)} grades.')
         if error_count > 0:
             messages.error(request, f'Failed to process {error_count} grades. Please check your input.')
         
         return redirect('grade_entry')
     
-    # Get existing grades for this course
+    # Get enrolled students
+    enrollments = Enrollment.objects.filter(course=course).select_related('student')
+    students = [enrollment.student for enrollment in enrollments]
+    
+    # Existing grades for this course, keyed without touching the student rows
     existing_grades = {
-        grade.student.id: grade 
-        for grade in Grade.objects.filter(course=course)
+        grade.student_id: grade
+        for grade in Grade.objects.filter(course=course).only('student_id', 'marks', 'grade')
     }
     
     return render(request, 'core/bulk_grade_entry.html', {
@@ -372,15 +460,16 @@ def bulk_grade_entry_view(request, course_id):
     })
 
 
+@query_budget(26)
 @login_required
 def attendance_entry_view(request):
-    if not (request.user.is_staff or hasattr(request.user, 'teacher')):
+    if not (request.role.is_admin or request.role.is_teacher):
         messages.error(request, 'You do not have permission to view this page.')
         return redirect('dashboard')
     
     teacher = None
-    if hasattr(request.user, 'teacher'):
-        teacher = request.user.teacher
+    if request.role.is_teacher:
+        teacher = request.profile
     
     # Handle attendance entry form
     attendance_form = AttendanceEntryForm(teacher=teacher)
@@ -416,28 +505,245 @@ def attendance_entry_view(request):
     })
 
 
+@query_budget(25)
+@login_required
+def bulk_attendance_entry_view(request, course_id, date):
+    if not (request.role.is_admin or request.role.is_teacher):
+        messages.error(request, 'You do not have permission to view this page.')
+        return redirect('dashboard')
+    
+    course = get_object_or_404(Course, id=course_id)
+    
+    if request.role.is_teacher:
+        if course.teacher_id != request.role.teacher_id:
+            messages.error(request, 'You can only mark attendance for your own courses.')
+            return redirect('attendance_entry')
+    
+    try:
+        attendance_date = datetime.date.fromisoformat(date)
+    except ValueError:
+        messages.error(request, 'Invalid attendance date.')
+        return redirect('attendance_entry')
+    
+    if request.method == 'POST':
+        valid_statuses = {choice for choice, _ in Attendance.STATUS_CHOICES}
+        enrolled_ids = Enrollment.objects.filter(course=course).values_list('student_id', flat=True)
+        
+        records = []
+        error_count = 0
+        for student_id in enrolled_ids:
+            status_value = request.POST.get(f'status_{student_id}')
+            if not status_value:
+                continue
+            if status_value not in valid_statuses:
+                error_count += 1
+                continue
+            records.append(Attendance(
+                student_id=student_id,
+                course=course,
+                date=attendance_date,
+                status=status_value
+            ))
+        
+        # Insert or update the whole roster in one statement
+        with transaction.atomic():
+            Attendance.objects.bulk_create(
+                records,
+                update_conflicts=True,
+                unique_fields=['student', 'course', 'date'],
+                update_fields=['status']
+            )
+            # bulk_create skips the Attendance signals, so mirror the bitmaps and rollups here
+            record_attendance(records)
+            update_attendance_rollups(records)
+            transaction.on_commit(lambda: bump_data_version('attendance'))
+        
+        if records:
+            messages.success(request, f'Attendance saved for {len(records)} students.')
+        if error_count > 0:
+            messages.error(request, f'Failed to process {error_count} attendance entries. Please check your input.')
+        
+        return redirect('attendance_entry')
+    
+    # Enrolled roster with any status already recorded for this date
+    current_status = Attendance.objects.filter(
+        student=OuterRef('pk'), course=course, date=attendance_date
+    ).values('status')[:1]
+    students = Student.objects.filter(enrollment__course=course).annotate(
+        current_status=Subquery(current_status)
+    ).order_by('roll_no')
+    
+    return render(request, 'core/bulk_attendance_entry.html', {
+        'course': course,
+        'date': attendance_date,
+        'students': students,
+    })
+
+
+# Role scoping shared by the API and the exports
+def attendance_for_user(user):
+    """Attendance records the user is allowed to see"""
+    role = role_of(user)
+    if user.is_staff:
+        return Attendance.objects.all()
+    elif role.teacher_id is not None:
+        # Teachers can see attendance for their courses
+        return Attendance.objects.filter(course__teacher_id=role.teacher_id)
+    elif role.student_id is not None:
+        # Students can only see their own attendance
+        return Attendance.objects.filter(student_id=role.student_id)
+    return Attendance.objects.none()
+
+
+def searchable_kinds(user):
+    """Kinds of search result the user may see; None means all of them"""
+    role = role_of(user)
+    if role.is_admin or role.is_teacher:
+        return None
+    # Students can look up teachers and courses, not each other
+    return ('teacher', 'course')
+
+
+def search_result_url(role, result):
+    if result['type'] == 'course':
+        return reverse('course_detail', args=[result['id']])
+    if result['type'] == 'student':
+        return f"{reverse('student_list')}?{urlencode({'q': result['detail']})}"
+    return reverse('teacher_list') if role.is_admin else None
+
+
+def grades_for_user(user):
+    """Grades the user is allowed to see"""
+    role = role_of(user)
+    if user.is_staff:
+        return Grade.objects.all()
+    elif role.teacher_id is not None:
+        # Teachers can see grades for their courses
+        return Grade.objects.filter(course__teacher_id=role.teacher_id)
+    elif role.student_id is not None:
+        # Students can only see their own grades
+        return Grade.objects.filter(student_id=role.student_id)
+    return Grade.objects.none()
+
+
+def bulk_write_errors(user, objects, require_enrollment=True):
+    """
+    Set-based checks for a batch of student/course rows about to be written:
+    the students and courses exist, teachers only write to their own
+    courses and, unless require_enrollment is False, every student is
+    enrolled in the course. Runs three queries whatever the batch size.
+    Returns {index: [messages]}.
+    """
+    student_ids = {obj.student_id for obj in objects.values()}
+    course_ids = {obj.course_id for obj in objects.values()}
+    known_students = set(Student.objects.filter(id__in=student_ids).values_list('id', flat=True))
+    course_teachers = dict(Course.objects.filter(id__in=course_ids).values_list('id', 'teacher_id'))
+    enrolled = set()
+    if require_enrollment:
+        enrolled = set(Enrollment.objects.filter(
+            student_id__in=student_ids, course_id__in=course_ids
+        ).values_list('student_id', 'course_id'))
+    teacher_id = None if user.is_staff else role_of(user).teacher_id
+    
+    errors = {}
+    for index, obj in objects.items():
+        messages_for_item = []
+        if obj.student_id not in known_students:
+            messages_for_item.append(f'Student {obj.student_id} does not exist.')
+        if obj.course_id not in course_teachers:
+            messages_for_item.append(f'Course {obj.course_id} does not exist.')
+        elif teacher_id is not None and course_teachers[obj.course_id] != teacher_id:
+            messages_for_item.append(f'Course {obj.course_id} is not one of your courses.')
+        if require_enrollment and not messages_for_item and (obj.student_id, obj.course_id) not in enrolled:
+            messages_for_item.append(f'Student {obj.student_id} is not enrolled in course {obj.course_id}.')
+        if messages_for_item:
+            errors[index] = messages_for_item
+    return errors
+
+
+# Export views
+ATTENDANCE_EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('date', 'date'),
+    ('student_id', 'student_id'),
+    ('roll_no', 'student__roll_no'),
+    ('student_name', 'student__name'),
+    ('course_code', 'course__code'),
+    ('course_name', 'course__name'),
+    ('status', 'status'),
+]
+
+GRADE_EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('student_id', 'student_id'),
+    ('roll_no', 'student__roll_no'),
+    ('student_name', 'student__name'),
+    ('course_code', 'course__code'),
+    ('course_name', 'course__name'),
+    ('marks', 'marks'),
+    ('grade', 'grade'),
+    ('grade_point', 'grade_point'),
+]
+
+
+@query_budget(5)
+@login_required
+def export_attendance(request, export_format):
+    """Stream the attendance records visible to the user as CSV or JSONL"""
+    records = attendance_for_user(request.user).order_by('date', 'id')
+    return streaming_export(records, ATTENDANCE_EXPORT_FIELDS, 'attendance', export_format)
+
+
+@query_budget(5)
+@login_required
+def export_grades(request, export_format):
+    """Stream the grades visible to the user as CSV or JSONL"""
+    grades = grades_for_user(request.user).order_by('id')
+    return streaming_export(grades, GRADE_EXPORT_FIELDS, 'grades', export_format)
+
+
 # AJAX helper views
+@query_budget(10)
 @login_required
 def get_course_students(request, course_id):
     """AJAX endpoint to get students enrolled in a course"""
-    if not (request.user.is_staff or hasattr(request.user, 'teacher')):
+    if not (request.role.is_admin or request.role.is_teacher):
         return JsonResponse({'error': 'Permission denied'}, status=403)
     
     course = get_object_or_404(Course, id=course_id)
-    students = Student.objects.filter(enrollment__course=course).values('id', 'name', 'student_id')
+    students = Student.objects.filter(enrollment__course=course).values('id', 'name', 'roll_no')
     
     return JsonResponse({'students': list(students)})
 
 
+@query_budget(4)
 @login_required
 def calculate_grade_ajax(request):
     """AJAX endpoint to calculate grade from marks using Nepali grading system"""
     if request.method == 'POST':
         try:
+            from core.utils.grading import calculate_nepali_grade, calculate_nepali_grades
+            
+            # Several marks posted at once are graded in a single batch
+            marks_list = request.POST.getlist('marks')
+            if len(marks_list) > 1:
+                marks_values = [float(marks) for marks in marks_list]
+                grades, grade_points = calculate_nepali_grades(marks_values)
+                return JsonResponse({
+                    'results': [
+                        {
+                            'marks': marks,
+                            'grade': grade,
+                            'grade_point': grade_point,
+                            'description': f'{grade} ({grade_point} GPA)'
+                        }
+                        for marks, grade, grade_point in zip(marks_values, grades, grade_points)
+                    ]
+                })
+            
             marks = float(request.POST.get('marks', 0))
             
             # Use Nepali grading system
-            from core.utils.grading import calculate_nepali_grade
             grade, grade_point = calculate_nepali_grade(marks)
             
             return JsonResponse({
@@ -451,13 +757,25 @@ def calculate_grade_ajax(request):
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+# Search API
+@query_budget(3)
+@api_view(['GET'])
+def search_api(request):
+    """Ranked full-text matches across students, teachers and courses for ?q="""
+    query = request.query_params.get('q', '').strip()
+    return Response({'query': query, 'results': search(query, searchable_kinds(request.user))})
+
+
 # API ViewSets
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(CachedResponseMixin, CascadeDestroyMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
+    cache_dependencies = ('student', 'enrollment', 'course', 'user')
+    cascade_models = (Enrollment, Attendance, Grade)
+    query_budgets = {'list': 3, 'retrieve': 3, 'update': 10, 'partial_update': 10, 'destroy': 30, 'rankings': 3}
     
     def get_permissions(self):
-        if self.action == 'list':
+        if self.action in ['list', 'rankings']:
             permission_classes = [IsTeacherOrAdmin]
         elif self.action in ['create', 'destroy']:
             permission_classes = [IsAdmin]
@@ -467,31 +785,55 @@ class StudentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        role = role_of(user)
         if user.is_staff:
             return Student.objects.all()
-        elif hasattr(user, 'teacher'):
+        elif role.teacher_id is not None:
             # Teachers can see students in their courses
-            teacher_courses = Course.objects.filter(teacher=user.teacher)
-            enrolled_students = Enrollment.objects.filter(course__in=teacher_courses).values_list('student', flat=True)
+            enrolled_students = Enrollment.objects.filter(course__teacher_id=role.teacher_id).values_list('student', flat=True)
             return Student.objects.filter(id__in=enrolled_students)
-        elif hasattr(user, 'student'):
+        elif role.student_id is not None:
             # Students can only see themselves
-            return Student.objects.filter(user=user)
+            return Student.objects.filter(id=role.student_id)
         return Student.objects.none()
+    
+    @action(detail=False, methods=['get'])
+    def rankings(self, request):
+        """Rank, GPA and percentile of every graded student in a class"""
+        student_class = request.query_params.get('class')
+        if not student_class:
+            return Response({'error': 'The "class" query parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        rankings = get_class_rankings(student_class)
+        if not request.user.is_staff:
+            # Ranks are class-wide, but only students this user can see are listed
+            visible = set(self.get_queryset().filter(student_class=student_class).values_list('id', flat=True))
+            rankings = [row for row in rankings if row['student_id'] in visible]
+        return Response({
+            'class': student_class,
+            'rankings': rankings,
+        })
 
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(CachedResponseMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Teacher.objects.all()
     serializer_class = TeacherSerializer
+    cache_dependencies = ('teacher', 'user')
     permission_classes = [IsAdmin]
+    query_budgets = {'list': 3, 'retrieve': 3, 'update': 6, 'partial_update': 6, 'destroy': 6}
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(CachedResponseMixin, CascadeDestroyMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    cache_dependencies = ('course', 'teacher', 'user')
+    cascade_models = (Enrollment, Attendance, Grade)
+    query_budgets = {
+        'list': 3, 'retrieve': 3, 'create': 6, 'update': 6, 'partial_update': 6, 'destroy': 30,
+        'students': 4, 'attendance_trend': 4, 'rankings': 4,
+    }
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'rankings']:
             permission_classes = [IsTeacherOrAdmin]
         else:
             permission_classes = [permissions.IsAuthenticated]
@@ -501,63 +843,170 @@ class CourseViewSet(viewsets.ModelViewSet):
     def students(self, request, pk=None):
         """Get students enrolled in a course"""
         course = self.get_object()
-        enrollments = Enrollment.objects.filter(course=course)
-        students = [enrollment.student for enrollment in enrollments]
-        serializer = StudentSerializer(students, many=True)
-        return Response(serializer.data)
+        students = eager_load(Student.objects.filter(enrollment__course=course), StudentSerializer, request)
+        page = self.paginate_queryset(students)
+        serializer = StudentSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path='attendance-trend')
+    def attendance_trend(self, request, pk=None):
+        """Daily (default) or ?period=monthly attendance counts for a course, from the rollups"""
+        course = self.get_object()
+        period = request.query_params.get('period', 'daily')
+        if period not in ('daily', 'monthly'):
+            return Response({'error': '"period" must be "daily" or "monthly".'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if period == 'daily':
+            rollups, period_field = CourseDailyAttendance.objects.filter(course=course), 'date'
+        else:
+            rollups, period_field = CourseMonthlyAttendance.objects.filter(course=course), 'month'
+        
+        try:
+            if request.query_params.get('date_from'):
+                date_from = datetime.date.fromisoformat(request.query_params['date_from'])
+                if period == 'monthly':
+                    date_from = date_from.replace(day=1)
+                rollups = rollups.filter(**{f'{period_field}__gte': date_from})
+            if request.query_params.get('date_to'):
+                date_to = datetime.date.fromisoformat(request.query_params['date_to'])
+                rollups = rollups.filter(**{f'{period_field}__lte': date_to})
+        except ValueError:
+            return Response({'error': 'Dates must be in YYYY-MM-DD format.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        trend = [
+            {
+                period_field: rollup_period,
+                'present': present,
+                'absent': absent,
+                'percentage': attendance_percentage(present, present + absent),
+            }
+            for rollup_period, present, absent in rollups.order_by(period_field).values_list(
+                period_field, 'present_count', 'absent_count'
+            )
+        ]
+        return Response({'course': course.code, 'period': period, 'trend': trend})
+    
+    @action(detail=True, methods=['get'])
+    def rankings(self, request, pk=None):
+        """Rank and percentile of every graded student in a course"""
+        course = self.get_object()
+        if not request.user.is_staff and course.teacher_id != role_of(request.user).teacher_id:
+            raise PermissionDenied('You can only view rankings for your own courses.')
+        return Response({
+            'course': course.code,
+            'rankings': get_course_rankings(course.id),
+        })
 
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(CachedResponseMixin, BulkUpsertMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
+    cache_dependencies = ('enrollment', 'student', 'course', 'teacher', 'user')
     permission_classes = [IsTeacherOrAdmin]
+    bulk_unique_fields = ('student', 'course')
+    query_budgets = {'list': 3, 'retrieve': 3, 'create': 3, 'update': 3, 'partial_update': 3, 'destroy': 3, 'bulk': 8}
+    
+    def bulk_errors(self, objects):
+        return bulk_write_errors(self.request.user, objects, require_enrollment=False)
+    
+    def after_bulk_write(self, objects):
+        invalidate_course_rosters(obj.course_id for obj in objects)
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(CachedResponseMixin, BulkUpsertMixin, FastListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    cache_dependencies = ('attendance', 'student', 'course', 'teacher', 'user')
+    bulk_unique_fields = ('student', 'course', 'date')
+    bulk_update_fields = ('status',)
+    # Moving a record to another day refreshes the rollups of both
+    query_budgets = {'list': 3, 'retrieve': 3, 'create': 15, 'update': 25, 'partial_update': 25, 'destroy': 16, 'bulk': 20}
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update']:
+        if self.action in ['create', 'update', 'partial_update', 'bulk']:
             permission_classes = [IsTeacherOrAdmin]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
     
+    pagination_ordering = ('date', 'id')
+    
     def get_queryset(self):
-        user = self.request.user
-        if user.is_staff:
-            return Attendance.objects.all()
-        elif hasattr(user, 'teacher'):
-            # Teachers can see attendance for their courses
-            teacher_courses = Course.objects.filter(teacher=user.teacher)
-            return Attendance.objects.filter(course__in=teacher_courses)
-        elif hasattr(user, 'student'):
-            # Students can only see their own attendance
-            return Attendance.objects.filter(student=user.student)
-        return Attendance.objects.none()
-
-
-class GradeViewSet(viewsets.ModelViewSet):
+        return self.filter_attendance(attendance_for_user(self.request.user))
+    
+    def bulk_errors(self, objects):
+        return bulk_write_errors(self.request.user, objects)
+    
+    def after_bulk_write(self, objects):
+        record_attendance(objects)
+        update_attendance_rollups(objects)
+    
+    def filter_attendance(self, queryset):
+        """Apply the ?course=, ?student=, ?date_from= and ?date_to= filters"""
+        params = self.request.query_params
+        errors = {}
+        for param in ('course', 'student'):
+            if params.get(param):
+                try:
+                    queryset = queryset.filter(**{f'{param}_id': int(params[param])})
+                except ValueError:
+                    errors[param] = 'Must be an integer id.'
+        for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+            if params.get(param):
+                try:
+                    queryset = queryset.filter(**{lookup: datetime.date.fromisoformat(params[param])})
+                except ValueError:
+                    errors[param] = 'Must be a date in YYYY-MM-DD format.'
+        if errors:
+            raise ValidationError(errors)
+        return queryset
+
+
+class GradeViewSet(CachedResponseMixin, BulkUpsertMixin, FastListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
+    cache_dependencies = ('grade', 'student', 'course', 'teacher', 'user')
+    bulk_unique_fields = ('student', 'course')
+    bulk_update_fields = ('marks', 'grade', 'grade_point')
+    query_budgets = {
+        'list': 3, 'retrieve': 3, 'create': 10, 'update': 10, 'partial_update': 10, 'destroy': 6,
+        'bulk': 15, 'distribution': 3,
+    }
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update']:
+        if self.action in ['create', 'update', 'partial_update', 'bulk']:
             permission_classes = [IsTeacherOrAdmin]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
-        user = self.request.user
-        if user.is_staff:
-            return Grade.objects.all()
-        elif hasattr(user, 'teacher'):
-            # Teachers can see grades for their courses
-            teacher_courses = Course.objects.filter(teacher=user.teacher)
-            return Grade.objects.filter(course__in=teacher_courses)
-        elif hasattr(user, 'student'):
-            # Students can only see their own grades
-            return Grade.objects.filter(student=user.student)
-        return Grade.objects.none()
+        return grades_for_user(self.request.user)
+    
+    def bulk_errors(self, objects):
+        return bulk_write_errors(self.request.user, objects)
+    
+    def prepare_bulk(self, objects):
+        # Grade.save() is bypassed, so grade the whole batch in one pass
+        letters, points = calculate_nepali_grades([grade.marks for grade in objects])
+        for grade, letter, point in zip(objects, letters, points):
+            grade.grade, grade.grade_point = letter, point
+    
+    def after_bulk_write(self, objects):
+        student_ids = {grade.student_id for grade in objects}
+        rebuild_student_summaries(student_ids)
+        invalidate_rankings(
+            set(Student.objects.filter(id__in=student_ids).values_list('student_class', flat=True)),
+            {grade.course_id for grade in objects}
+        )
+    
+    @action(detail=False, methods=['get'])
+    def distribution(self, request):
+        """Grade letter counts over the visible grades, optionally ?by=course or ?by=class"""
+        by = request.query_params.get('by')
+        if by and by not in DISTRIBUTION_GROUPINGS:
+            return Response(
+                {'error': f'"by" must be one of: {", ".join(DISTRIBUTION_GROUPINGS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'distribution': get_grade_distribution(self.get_queryset(), by=by or None)})
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from core.models import Student, Teacher, Course, Enrollment, Attendance, Grade
+from core.utils.grading import calculate_nepali_grades
 from datetime import date, timedelta
 import random
 
@@ -146,40 +147,32 @@ class Command(BaseCommand):
                     )
 
         # Generate grades for all enrolled students
-        grade_options = [
-            (95, 'A+'), (92, 'A'), (88, 'A-'), (85, 'B+'), (82, 'B'), 
-            (78, 'B-'), (75, 'C+'), (72, 'C'), (68, 'C-'), (65, 'D'), (50, 'F')
-        ]
+        grade_options = [95, 92, 88, 85, 82, 78, 75, 72, 68, 65, 50]
 
+        pairs = []
+        all_marks = []
         for student in all_students:
             enrolled_courses = Course.objects.filter(enrollment__student=student)
             for course in enrolled_courses:
                 # Generate random but realistic grades
-                marks, grade_letter = random.choice(grade_options)
+                marks = random.choice(grade_options)
                 marks += random.randint(-5, 5)  # Add some variation
                 marks = max(0, min(100, marks))  # Keep within 0-100 range
-                
-                # Determine grade based on marks
-                if marks >= 95: grade_letter = 'A+'
-                elif marks >= 90: grade_letter = 'A'
-                elif marks >= 85: grade_letter = 'A-'
-                elif marks >= 80: grade_letter = 'B+'
-                elif marks >= 75: grade_letter = 'B'
-                elif marks >= 70: grade_letter = 'B-'
-                elif marks >= 65: grade_letter = 'C+'
-                elif marks >= 60: grade_letter = 'C'
-                elif marks >= 55: grade_letter = 'C-'
-                elif marks >= 50: grade_letter = 'D'
-                else: grade_letter = 'F'
-                
-                grade_obj, created = Grade.objects.get_or_create(
-                    student=student,
-                    course=course,
-                    defaults={
-                        'marks': marks,
-                        'grade': grade_letter
-                    }
-                )
+                pairs.append((student, course))
+                all_marks.append(marks)
+
+        # Determine grades for every mark in one batch
+        all_grades, _ = calculate_nepali_grades(all_marks)
+
+        for (student, course), marks, grade_letter in zip(pairs, all_marks, all_grades):
+            grade_obj, created = Grade.objects.get_or_create(
+                student=student,
+                course=course,
+                defaults={
+                    'marks': marks,
+                    'grade': grade_letter
+                }
+            )
 
         self.stdout.write(self.style.SUCCESS('Enhanced data population completed!'))
         self.stdout.write(self.style.WARNING(f'Total Teachers: {Teacher.objects.count()}'))
@@ -15,36 +15,28 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sms.settings')
 django.setup()
 
 from core.models import Student, Course, Grade, Enrollment
+from core.utils.grading import calculate_nepali_grades
 
 def add_sample_grades():
     """Add sample grades for enrolled students"""
     
-    # Get all enrollments
-    enrollments = Enrollment.objects.all()
+    # Get all enrollments that don't have a grade yet
+    graded = set(Grade.objects.values_list('student_id', 'course_id'))
+    enrollments = [
+        enrollment
+        for enrollment in Enrollment.objects.select_related('student', 'course')
+        if (enrollment.student_id, enrollment.course_id) not in graded
+    ]
+    
+    # Generate random marks between 50-100
+    all_marks = [round(uniform(50, 100), 1) for _ in enrollments]
+    
+    # Calculate grades for all marks in one batch
+    all_grades, _ = calculate_nepali_grades(all_marks)
     
     grades_added = 0
     
-    for enrollment in enrollments:
-        # Skip if grade already exists
-        if Grade.objects.filter(student=enrollment.student, course=enrollment.course).exists():
-            continue
-            
-        # Generate random marks between 50-100
-        marks = round(uniform(50, 100), 1)
-        
-        # Calculate grade based on marks
-        if marks >= 95: grade = 'A+'
-        elif marks >= 90: grade = 'A'
-        elif marks >= 85: grade = 'A-'
-        elif marks >= 80: grade = 'B+'
-        elif marks >= 75: grade = 'B'
-        elif marks >= 70: grade = 'B-'
-        elif marks >= 65: grade = 'C+'
-        elif marks >= 60: grade = 'C'
-        elif marks >= 55: grade = 'C-'
-        elif marks >= 50: grade = 'D'
-        else: grade = 'F'
-        
+    for enrollment, marks, grade in zip(enrollments, all_marks, all_grades):
         # Create grade
         Grade.objects.create(
             student=enrollment.student,
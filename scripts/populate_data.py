@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from core.models import Student, Teacher, Course, Enrollment, Attendance, Grade
+from core.utils.grading import calculate_nepali_grades
 from datetime import date, timedelta
 import random
 
@@ -131,26 +132,22 @@ class Command(BaseCommand):
                     )
 
         # Create sample grades
-        grade_scale = ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D', 'F']
-        marks_range = [(95, 'A+'), (90, 'A'), (85, 'A-'), (80, 'B+'), (75, 'B'), 
-                      (70, 'B-'), (65, 'C+'), (60, 'C'), (55, 'C-'), (50, 'D'), (0, 'F')]
-
-        for student in students:
-            for course in courses:
-                # Random marks between 50-100
-                marks = random.randint(50, 100)
-                grade = next(g for m, g in marks_range if marks >= m)
-                
-                grade_obj, created = Grade.objects.get_or_create(
-                    student=student,
-                    course=course,
-                    defaults={
-                        'marks': marks,
-                        'grade': grade
-                    }
-                )
-                if created:
-                    self.stdout.write(f'Created grade for {student.name} in {course.name}: {grade}')
+        pairs = [(student, course) for student in students for course in courses]
+        # Random marks between 50-100, graded in one batch
+        all_marks = [random.randint(50, 100) for _ in pairs]
+        all_grades, _ = calculate_nepali_grades(all_marks)
+
+        for (student, course), marks, grade in zip(pairs, all_marks, all_grades):
+            grade_obj, created = Grade.objects.get_or_create(
+                student=student,
+                course=course,
+                defaults={
+                    'marks': marks,
+                    'grade': grade
+                }
+            )
+            if created:
+                self.stdout.write(f'Created grade for {student.name} in {course.name}: {grade}')
 
         self.stdout.write(self.style.SUCCESS('Sample data population completed!'))
         self.stdout.write(self.style.WARNING('Teacher login: username="john_math", password="teacher123"'))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -40,11 +41,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,9 +79,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Holds only the database cache's table (see CACHES below)
+    'cache': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'cache.sqlite3',
+    },
 }
 
+DATABASE_ROUTERS = ['core.routers.CacheRouter']
+
 # For production, you might want PostgreSQL
 # DATABASES = {
 #     'default': {
@@ -92,6 +102,43 @@ DATABASES = {
 # }
 
 
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# Cached responses, rosters and rankings are invalidated through data
+# versions kept in the default cache (core.utils.response_cache), and
+# RoleMiddleware re-resolves roles off the same versions, so every worker
+# process must share one cache: the per-process LocMemCache won't do. Set
+# REDIS_URL in production (needs the redis package). Otherwise the database
+# cache is used, kept in the 'cache' database so it doesn't wait on the main
+# database's write lock; create its table once with
+#     python manage.py createcachetable --database cache
+# Query budgets count the default database only, but cache queries still
+# cost: a cached API list or retrieve runs 2 on the cache database when it
+# hits (data versions, response) and 5 when it misses (storing the response
+# is a COUNT, a SELECT and an INSERT or UPDATE). Each data version missing
+# from the cache, after a flush or cull, adds 3 more plus one read-back for
+# the lot; a write bumps its models' versions with 3 queries each. Session
+# requests also read the profile versions (1 query) in RoleMiddleware.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'sms_cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -136,13 +183,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
+# Largest ?page_size= an API client may ask for
+API_MAX_PAGE_SIZE = 500
+
+# Query budgets (see core.query_budget): checked while DEBUG is on, and
+# enforced by the test suite, which raises on overruns instead of logging
+QUERY_BUDGET_CHECK = DEBUG
+QUERY_BUDGET_ACTION = 'log'
+# For views that don't declare a budget of their own
+QUERY_BUDGET_DEFAULT = 10
+
 # Simple JWT settings
 
 SIMPLE_JWT = {
@@ -150,6 +213,10 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    # Adds role, teacher_id, student_id and is_staff claims to every token
+    'TOKEN_OBTAIN_SERIALIZER': 'core.authentication.RoleTokenObtainPairSerializer',
+    # Reloads the user on refresh, so the claims follow role changes
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.RoleTokenRefreshSerializer',
 }
 
 # Login/Logout URLs